@@ -0,0 +1,98 @@
+"""Benchmark the cron expression engine on a fleet-sized set of schedules.
+
+Generates random (but valid) cron expressions and times compiling them,
+computing next/prev runs, and answering "what fires in the next N
+minutes" across all of them.
+
+Usage (from the agent directory):
+
+    python benchmarks/bench_cronexpr.py --count 10000 --window 5
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from piwatch_agent import cronexpr  # noqa: E402
+
+
+def _random_field(rng: random.Random, low: int, high: int) -> str:
+    kind = rng.random()
+    if kind < 0.35:
+        return "*"
+    if kind < 0.55:
+        return "*/%d" % rng.randint(2, max(2, (high - low) // 2))
+    if kind < 0.75:
+        return str(rng.randint(low, high))
+    if kind < 0.9:
+        start = rng.randint(low, high - 1)
+        return "%d-%d" % (start, rng.randint(start + 1, high))
+    return ",".join(str(v) for v in sorted(rng.sample(range(low, high + 1), 3)))
+
+
+def generate(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    aliases = list(cronexpr.ALIASES)
+    exprs = []
+    for _ in range(count):
+        if rng.random() < 0.05:
+            exprs.append(rng.choice(aliases))
+            continue
+        exprs.append(" ".join((
+            _random_field(rng, 0, 59),
+            _random_field(rng, 0, 23),
+            _random_field(rng, 1, 28),
+            _random_field(rng, 1, 12),
+            _random_field(rng, 0, 6),
+        )))
+    return exprs
+
+
+def _report(label: str, elapsed: float, count: int) -> None:
+    print("%-28s %8.1f ms total  %7.2f us/expr" % (label, elapsed * 1000, elapsed / count * 1e6))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=10000, help="number of expressions")
+    parser.add_argument("--window", type=int, default=5, help="minutes ahead for the fires-soon query")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    exprs = generate(args.count, args.seed)
+    now = datetime.now()
+
+    started = time.perf_counter()
+    compiled = [cronexpr.CronExpr(e) for e in exprs]
+    _report("compile", time.perf_counter() - started, len(exprs))
+
+    started = time.perf_counter()
+    for c in compiled:
+        c.next_run(now)
+    _report("next_run", time.perf_counter() - started, len(exprs))
+
+    started = time.perf_counter()
+    for c in compiled:
+        c.prev_run(now)
+    _report("prev_run", time.perf_counter() - started, len(exprs))
+
+    deadline = now + timedelta(minutes=args.window)
+    started = time.perf_counter()
+    firing = 0
+    for c in compiled:
+        t = c.next_run(now)
+        if t is not None and t <= deadline:
+            firing += 1
+    _report("fires in next %d min" % args.window, time.perf_counter() - started, len(exprs))
+    print("%d of %d expressions fire before %s" % (firing, len(exprs), deadline.strftime("%H:%M")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Compare response size and encode time across agent encodings.
+
+Encodes representative payloads (a live /metrics snapshot, a long
+process list, a fleet-sized Docker container list and a /cron response
+with raw crontab text) as JSON and MessagePack, each uncompressed and with
+gzip/deflate at the configured level, and reports bytes on the wire and
+per-call encode latency.
+
+Usage (from the agent directory):
+
+    python benchmarks/bench_encoding.py --calls 200 --level 6
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from piwatch_agent import encoding  # noqa: E402
+from piwatch_agent.collectors import cpu, disk, memory, network, process, temperature  # noqa: E402
+
+
+def _metrics_payload() -> Dict[str, Any]:
+    cpu.collect(interval=None)
+    return {
+        "timestamp": "2024-01-01T00:00:00Z",
+        "cpu": cpu.collect(interval=0.2),
+        "memory": memory.collect(),
+        "disk": disk.collect(),
+        "temperature": temperature.collect(),
+        "network": network.collect(),
+        "processes": process.collect(limit=15),
+        "docker": {"available": False, "containers": [], "container_count": 0},
+    }
+
+
+def _docker_payload(rng: random.Random, count: int) -> Dict[str, Any]:
+    images = ["nginx:1.25", "postgres:16", "redis:7-alpine", "grafana/grafana:10.2.3", "homeassistant/home-assistant:stable"]
+    containers = []
+    for i in range(count):
+        port = 8000 + i
+        containers.append({
+            "id": "%012x" % rng.getrandbits(48),
+            "name": "service-%d" % i,
+            "image": rng.choice(images),
+            "status": "Up %d hours" % rng.randint(1, 500),
+            "ports": "0.0.0.0:%d->80/tcp, :::%d->80/tcp" % (port, port),
+            "state": "running",
+        })
+    return {"available": True, "containers": containers, "container_count": count}
+
+
+def _cron_payload(rng: random.Random, users: int, jobs: int) -> Dict[str, Any]:
+    data: Dict[str, Any] = {}
+    for u in range(users):
+        lines = ["# m h  dom mon dow   command"]
+        parsed = []
+        for j in range(jobs):
+            schedule = "%d %d * * *" % (rng.randint(0, 59), rng.randint(0, 23))
+            command = "/usr/local/bin/backup.sh --target /mnt/nas/job%d >> /var/log/backup-%d.log 2>&1" % (j, j)
+            lines.append("%s %s" % (schedule, command))
+            parsed.append({
+                "schedule": schedule, "command": command, "enabled": True,
+                "next_run": "2024-01-02T03:04:00Z", "prev_run": "2024-01-01T03:04:00Z",
+            })
+        data["user%d" % u] = {"raw": "\n".join(lines) + "\n", "jobs": parsed}
+    return {"users": data, "system": {"raw": "", "jobs": []}}
+
+
+def _encoders(level: int) -> List[Tuple[str, Callable[[Any], bytes]]]:
+    def to_json(data: Any) -> bytes:
+        return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+    return [
+        ("json", to_json),
+        ("json+gzip", lambda d: encoding.compress(to_json(d), "gzip", level)),
+        ("json+deflate", lambda d: encoding.compress(to_json(d), "deflate", level)),
+        ("msgpack", encoding.msgpack_dumps),
+        ("msgpack+gzip", lambda d: encoding.compress(encoding.msgpack_dumps(d), "gzip", level)),
+    ]
+
+
+def _time(fn: Callable[[], Any], calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - started) / calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--level", type=int, default=6, help="gzip/deflate compression level")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    payloads = [
+        ("metrics", _metrics_payload()),
+        ("processes x200", process.top(200, "cpu")),
+        ("docker x50", _docker_payload(rng, 50)),
+        ("cron 5x40", _cron_payload(rng, 5, 40)),
+    ]
+
+    for label, data in payloads:
+        baseline = None
+        print("%s" % label)
+        for name, encode in _encoders(args.level):
+            size = len(encode(data))
+            baseline = baseline or size
+            per_call = _time(lambda: encode(data), args.calls)
+            print("  %-13s %8d bytes  %5.1fx smaller  %8.3f ms" % (name, size, baseline / size, per_call * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Benchmark the agent's HTTP front end under concurrent clients.
+
+Starts an in-process agent on an ephemeral port for each worker setting and
+drives it with N client threads, each reusing one keep-alive connection.
+Reports requests/sec and p50/p99 latency per configuration.
+
+``--idle`` first opens that many extra connections, makes one request on
+each and leaves them open for the whole run, the way pollers that come
+back every few seconds do. They must not slow down the active clients.
+
+Usage (from the agent directory):
+
+    python benchmarks/bench_http.py --clients 16 --requests 200 --workers 0 4 8
+    python benchmarks/bench_http.py --clients 4 --idle 8 --workers 4
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import logging
+import os
+import sys
+import threading
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from piwatch_agent import server  # noqa: E402
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(int(round(pct / 100.0 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def _client(port: int, paths: List[str], count: int, latencies: List[float], errors: List[int]) -> None:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    for i in range(count):
+        path = paths[i % len(paths)]
+        started = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            resp = conn.getresponse()
+            resp.read()
+        except (OSError, http.client.HTTPException):
+            errors.append(1)
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+
+
+def _open_idle(port: int, count: int) -> List[http.client.HTTPConnection]:
+    idle = []
+    for _ in range(count):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        conn.request("GET", "/health")
+        conn.getresponse().read()
+        idle.append(conn)
+    return idle
+
+
+def run_one(workers: int, clients: int, requests: int, paths: List[str], idle_count: int = 0) -> None:
+    sampler = server._build_sampler()
+    sampler.start()
+    sampler.wait_ready(timeout=10)
+
+    httpd = server.PiWatchServer(("127.0.0.1", 0), server.PiWatchHandler, sampler, workers=workers)
+    port = httpd.server_address[1]
+    serve = threading.Thread(target=httpd.serve_forever, daemon=True)
+    serve.start()
+    # Single-threaded serving holds the connection, so idle clients can't apply
+    idle = _open_idle(port, idle_count) if workers > 0 else []
+
+    latencies: List[float] = []
+    errors: List[int] = []
+    threads = [
+        threading.Thread(target=_client, args=(port, paths, requests, latencies, errors))
+        for _ in range(clients)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    for conn in idle:
+        conn.close()
+
+    httpd.shutdown()
+    httpd.server_close()
+    sampler.stop()
+
+    if not latencies:
+        print("workers=%-3d no successful requests (%d errors)" % (workers, len(errors)))
+        return
+    print(
+        "workers=%-3d clients=%-3d idle=%-3d requests=%-6d req/s=%8.1f  p50=%7.2fms  p99=%7.2fms  errors=%d"
+        % (
+            workers,
+            clients,
+            len(idle),
+            len(latencies),
+            len(latencies) / elapsed,
+            _percentile(latencies, 50) * 1000,
+            _percentile(latencies, 99) * 1000,
+            len(errors),
+        )
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=16, help="concurrent client connections")
+    parser.add_argument("--requests", type=int, default=200, help="requests per client")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 4, 8], help="worker counts to compare")
+    parser.add_argument("--idle", type=int, default=0, help="extra keep-alive connections left idle during the run")
+    parser.add_argument("--paths", nargs="+", default=["/metrics", "/health"], help="routes to cycle through")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    for workers in args.workers:
+        run_one(workers, args.clients, args.requests, args.paths, args.idle)
+
+
+if __name__ == "__main__":
+    main()
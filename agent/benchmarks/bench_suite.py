@@ -0,0 +1,452 @@
+"""Benchmark every collector and GET route, optionally against fixtures.
+
+Each collector and each route is measured in its own child process, so
+caches start cold, peak RSS belongs to that target alone and one target
+can't warm another. For every target the report gives the latency
+distribution (first call, mean, p50/p90/p99, max), CPU time per call
+(the agent's own and that of the processes it forked), subprocesses
+forked per call and the child's peak RSS.
+
+By default the targets run against a recorded fixture (fixtures/pi4): its
+/proc, sysfs and /etc files replace the host's through the collectors'
+path constants and psutil.PROCFS_PATH, and stub crontab, docker, iwconfig,
+iwgetid, nmcli and vcgencmd binaries on PATH print the fixture's recorded
+command output. Only the process list (live PIDs are linked into the
+fixture's /proc) and disk usage (statvfs of the fixture's mountpoints)
+still come from the host. That makes results from an ordinary x86 box
+comparable across commits.
+
+Routes are served by an in-process agent whose sampler has taken one
+sample and stopped, with a day of synthetic rows in a scratch store; the
+client runs in the same process, so route CPU time includes it. POST
+routes and /metrics/stream are not benchmarked.
+
+Usage (from the agent directory):
+
+    python benchmarks/bench_suite.py --calls 200 --output before.json
+    python benchmarks/bench_suite.py --calls 200 --compare before.json
+    python benchmarks/bench_suite.py --only cron /metrics --no-cache
+    python benchmarks/bench_suite.py --live               # this host, no fixture
+    python benchmarks/bench_suite.py --record fixtures/mypi   # capture a fixture on a Pi
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_HERE, ".."))
+
+DEFAULT_FIXTURE = os.path.join(_HERE, "fixtures", "pi4")
+
+COLLECTORS = (
+    "cpu", "memory", "disk", "disk_io", "pressure", "temperature",
+    "network", "process", "docker", "cron", "wifi", "system",
+)
+
+ROUTES = (
+    "/health",
+    "/metrics",
+    "/metrics?since=<cursor>",
+    "/metrics/history",
+    "/metrics/range",
+    "/metrics/prom",
+    "/processes",
+    "/cron",
+    "/wifi",
+    "/discover",
+    "/alerts",
+    "/agent/stats",
+)
+
+# Commands replaced by stubs that print the fixture's cmd/<name>_<args>.txt
+# (or cmd/<name>.txt), and fail like a missing tool when there is none
+STUB_COMMANDS = ("crontab", "docker", "iwconfig", "iwgetid", "nmcli", "vcgencmd")
+
+_STUB = """#!/bin/sh
+dir='%s'
+name=$(basename "$0")
+key="$name"
+for arg in "$@"; do key="${key}_$arg"; done
+for f in "$dir/$key.txt" "$dir/$name.txt"; do
+    [ -f "$f" ] && exec cat "$f"
+done
+exit 1
+"""
+
+# Files and globs copied by --record, relative to /
+_RECORD_FILES = (
+    "proc/stat", "proc/meminfo", "proc/vmstat", "proc/cpuinfo", "proc/loadavg", "proc/uptime",
+    "proc/filesystems", "proc/self/mounts", "proc/diskstats", "proc/net/dev", "proc/net/wireless",
+    "proc/pressure/cpu", "proc/pressure/memory", "proc/pressure/io", "proc/device-tree/model",
+    "sys/devices/platform/soc/soc:firmware/get_throttled",
+    "sys/block/*/dev", "sys/class/net/*/operstate",
+    "sys/class/thermal/thermal_zone*/type", "sys/class/thermal/thermal_zone*/temp",
+    "sys/class/hwmon/hwmon*/name", "sys/class/hwmon/hwmon*/temp*_input", "sys/class/hwmon/hwmon*/temp*_label",
+    "etc/passwd", "etc/crontab", "etc/cron.d/*", "var/spool/cron/crontabs/*",
+)
+
+
+# Fixtures
+
+def _link_proc(fixture: str, workdir: str) -> str:
+    """Build a /proc from the fixture's files plus links to the live PIDs."""
+    proc = os.path.join(workdir, "proc")
+    os.makedirs(proc)
+    for name in os.listdir(os.path.join(fixture, "proc")):
+        os.symlink(os.path.join(fixture, "proc", name), os.path.join(proc, name))
+    for name in os.listdir("/proc"):
+        if name.isdigit():
+            os.symlink(os.path.join("/proc", name), os.path.join(proc, name))
+    return proc
+
+
+def _write_stubs(fixture: str, workdir: str) -> str:
+    bindir = os.path.join(workdir, "bin")
+    os.makedirs(bindir)
+    for command in STUB_COMMANDS:
+        path = os.path.join(bindir, command)
+        with open(path, "w") as f:
+            f.write(_STUB % os.path.join(fixture, "cmd"))
+        os.chmod(path, 0o755)
+    return bindir
+
+
+def apply_fixture(fixture: str, workdir: str) -> None:
+    """Point psutil, the collectors and PATH at a fixture directory."""
+    import psutil
+    from piwatch_agent import hostinfo
+    from piwatch_agent.collectors import cron, diskio, docker, pressure, temperature, wifi
+
+    def path(*parts: str) -> str:
+        return os.path.join(fixture, *parts)
+
+    psutil.PROCFS_PATH = _link_proc(fixture, workdir)
+    os.environ["PATH"] = _write_stubs(fixture, workdir) + os.pathsep + os.environ.get("PATH", "")
+
+    diskio._DISKSTATS = path("proc", "diskstats")
+    diskio._SYS_BLOCK = path("sys", "block")
+    pressure._PRESSURE_DIR = path("proc", "pressure")
+    pressure._THROTTLED_SYSFS = path("sys", "devices", "platform", "soc", "soc:firmware", "get_throttled")
+    temperature._sensors = temperature.SensorSet(path("sys", "class", "thermal"), path("sys", "class", "hwmon"))
+    wifi._PROC_WIRELESS = path("proc", "net", "wireless")
+    wifi._SYS_NET = path("sys", "class", "net")
+    cron._PASSWD = path("etc", "passwd")
+    cron._SYSTEM_CRONTAB = path("etc", "crontab")
+    cron._CRON_D = path("etc", "cron.d")
+    cron._SPOOL_DIRS = (path("var", "spool", "cron", "crontabs"),)
+    docker._client = docker.DockerClient(path("run", "docker.sock"))
+    hostinfo._MODEL_PATH = path("proc", "device-tree", "model")
+
+
+def record(target: str) -> None:
+    """Copy this host's kernel files and tool output into a fixture directory."""
+    from piwatch_agent.collectors import cron, docker, wifi
+    from piwatch_agent import config
+
+    copied = 0
+    for pattern in _RECORD_FILES:
+        for src in glob.glob("/" + pattern):
+            dest = os.path.join(target, os.path.relpath(src, "/"))
+            try:
+                with open(src, "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            with open(dest, "wb") as f:
+                f.write(data)
+            copied += 1
+
+    outputs: Dict[str, Optional[str]] = {}
+    for user in cron._get_users_with_shells():
+        outputs["crontab_-l_-u_%s" % user] = wifi._run_cmd(["crontab", "-l", "-u", user])
+    iface = config.WIFI_INTERFACE
+    outputs["iwconfig"] = wifi._run_cmd(["iwconfig", iface])
+    outputs["iwgetid"] = wifi._run_cmd(["iwgetid", "-r", iface])
+    outputs["nmcli"] = wifi._run_cmd(["nmcli", "-t", "-f", "active,ssid", "dev", "wifi"])
+    outputs["vcgencmd_measure_temp"] = wifi._run_cmd(["vcgencmd", "measure_temp"])
+    outputs["vcgencmd_get_throttled"] = wifi._run_cmd(["vcgencmd", "get_throttled"])
+    containers = docker._collect_cli()
+    if containers is not None:
+        outputs["docker"] = "\n".join(json.dumps(c) for c in containers["containers"])
+
+    os.makedirs(os.path.join(target, "cmd"), exist_ok=True)
+    for key, output in outputs.items():
+        if output is not None:
+            with open(os.path.join(target, "cmd", key + ".txt"), "w") as f:
+                f.write(output + "\n")
+            copied += 1
+    print("recorded %d files into %s" % (copied, target))
+
+
+# Child side: measure one target
+
+_spawned = [0]
+
+
+def _count_subprocesses() -> None:
+    original = subprocess.Popen.__init__
+
+    def counting_init(self: Any, *args: Any, **kwargs: Any) -> None:
+        _spawned[0] += 1
+        original(self, *args, **kwargs)
+
+    subprocess.Popen.__init__ = counting_init  # type: ignore[assignment]
+
+
+def _disable_caches() -> None:
+    from piwatch_agent import config
+
+    config.WIFI_CACHE_TTL = 0
+    config.CPU_FREQ_TTL = 0
+    config.TEMP_VCGENCMD_TTL = 0
+    config.THROTTLE_CACHE_TTL = 0
+    config.DOCKER_MAX_AGE = 0
+
+
+def _collector(name: str) -> Callable[[], Any]:
+    from piwatch_agent.collectors import (
+        cpu, cron, disk, diskio, docker, memory, network, pressure, process, system, temperature, wifi,
+    )
+
+    return {
+        "cpu": lambda: cpu.collect(interval=None),
+        "memory": memory.collect,
+        "disk": disk.collect,
+        "disk_io": diskio.collect,
+        "pressure": pressure.collect,
+        "temperature": temperature.collect,
+        "network": network.collect,
+        "process": process.collect,
+        "docker": docker.collect,
+        "cron": cron.collect,
+        "wifi": wifi.collect,
+        "system": system.collect,
+    }[name]
+
+
+def _route(path: str, scratch: str) -> Callable[[], Any]:
+    """Start an in-process agent and return a function that GETs ``path``."""
+    import http.client
+    import threading
+
+    from piwatch_agent import alerts, config, server
+    from piwatch_agent.store import Store
+
+    sampler = server._build_sampler()
+    history = server._attach_history(sampler)
+    engine = alerts.AlertEngine(alerts.parse_rules(config.ALERT_RULES), config.ALERT_EVENTS)
+    sampler.add_listener(engine.on_sample)
+    sampler.start()
+    sampler.wait_ready(timeout=30)
+    sampler.stop()
+
+    # A day of rows at the sample interval, rolled up like a running agent's
+    store = Store(os.path.join(scratch, "store"), flush_seconds=3600)
+    store.open()
+    snapshot = sampler.snapshot()
+    now = time.time()
+    steps = int(86400 / config.SAMPLE_INTERVAL)
+    for i in range(steps, 0, -1):
+        store.record(now - i * config.SAMPLE_INTERVAL, snapshot)
+    store.flush()
+
+    httpd = server.PiWatchServer(
+        ("127.0.0.1", 0), server.PiWatchHandler, sampler,
+        workers=config.WORKERS, history=history, store=store, alert_engine=engine,
+    )
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    conn = http.client.HTTPConnection("127.0.0.1", httpd.server_address[1], timeout=30)
+    url = path.replace("<cursor>", sampler.cursor())
+
+    def get() -> None:
+        conn.request("GET", url, headers={"Accept-Encoding": "gzip"})
+        resp = conn.getresponse()
+        resp.read()
+        if resp.status not in (200, 304):
+            raise RuntimeError("%s returned HTTP %d" % (url, resp.status))
+
+    return get
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    index = min(int(round(pct / 100.0 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def measure(fn: Callable[[], Any], calls: int, warmup: int) -> Dict[str, Any]:
+    """Time ``calls`` calls of ``fn`` after ``warmup`` unmeasured ones."""
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    fn()
+    first = time.perf_counter() - started
+    for _ in range(max(warmup - 1, 0)):
+        fn()
+
+    _spawned[0] = 0
+    cpu_before = time.process_time()
+    times_before = os.times()
+    latencies = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    times_after = os.times()
+    own_cpu = time.process_time() - cpu_before
+
+    ordered = sorted(latencies)
+    child_cpu = ((times_after.children_user - times_before.children_user)
+                 + (times_after.children_system - times_before.children_system))
+    return {
+        "calls": calls,
+        "first_call_ms": round(first * 1000, 3),
+        "mean_ms": round(sum(latencies) / calls * 1000, 3),
+        "p50_ms": round(_percentile(ordered, 50) * 1000, 3),
+        "p90_ms": round(_percentile(ordered, 90) * 1000, 3),
+        "p99_ms": round(_percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "cpu_ms": round(own_cpu / calls * 1000, 3),
+        "child_cpu_ms": round(child_cpu / calls * 1000, 3),
+        "subprocesses": round(_spawned[0] / calls, 2),
+        # ru_maxrss is in KiB on Linux
+        "baseline_rss_kb": baseline_rss,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run_child(target: str, args: argparse.Namespace) -> None:
+    kind, _, name = target.partition(":")
+    scratch = tempfile.mkdtemp(prefix="piwatch-bench-")
+    try:
+        if args.fixture:
+            apply_fixture(os.path.abspath(args.fixture), scratch)
+        if args.no_cache:
+            _disable_caches()
+        _count_subprocesses()
+        fn = _collector(name) if kind == "collector" else _route(name, scratch)
+        result = measure(fn, args.calls, args.warmup)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    print(json.dumps(result))
+
+
+# Parent side: run every target and report
+
+def _spawn(target: str, args: argparse.Namespace) -> Dict[str, Any]:
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", target,
+           "--calls", str(args.calls), "--warmup", str(args.warmup)]
+    cmd += ["--fixture", args.fixture] if args.fixture else ["--live"]
+    if args.no_cache:
+        cmd.append("--no-cache")
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {"error": (proc.stderr.strip().splitlines() or ["exit status %d" % proc.returncode])[-1]}
+    return json.loads(lines[-1])
+
+
+def _commit() -> Optional[str]:
+    try:
+        result = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=_HERE,
+                                capture_output=True, text=True, timeout=10)
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return None
+    return result.stdout.strip() or None
+
+
+def _delta(new: float, old: float) -> str:
+    if not old:
+        return "     -"
+    return "%+5.0f%%" % ((new - old) / old * 100)
+
+
+def _report(results: Dict[str, Dict[str, Any]], base: Optional[Dict[str, Any]]) -> None:
+    header = "%-26s %9s %9s %9s %9s %8s %9s" % ("target", "p50 ms", "p99 ms", "cpu ms", "child ms", "forks", "peak KiB")
+    if base:
+        header += "  %6s %6s" % ("p50", "cpu")
+    print(header)
+    for section in ("collectors", "routes"):
+        for name, r in results[section].items():
+            label = name if section == "collectors" else "GET " + name
+            if "error" in r:
+                print("%-26s error: %s" % (label, r["error"]))
+                continue
+            line = "%-26s %9.3f %9.3f %9.3f %9.3f %8.2f %9d" % (
+                label, r["p50_ms"], r["p99_ms"], r["cpu_ms"], r["child_cpu_ms"], r["subprocesses"], r["peak_rss_kb"],
+            )
+            old = (base or {}).get(section, {}).get(name)
+            if old and "error" not in old:
+                line += "  %s %s" % (_delta(r["p50_ms"], old["p50_ms"]), _delta(r["cpu_ms"], old["cpu_ms"]))
+            print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE, help="fixture directory (default: fixtures/pi4)")
+    parser.add_argument("--live", action="store_true", help="measure against this host instead of a fixture")
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--no-cache", action="store_true",
+                        help="zero the wifi/cpu-frequency/vcgencmd/docker cache TTLs to measure uncached cost")
+    parser.add_argument("--only", nargs="+", metavar="TARGET", help="collector names and/or route paths")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="show changes against a previous --output file")
+    parser.add_argument("--record", metavar="DIR", help="capture this host as a fixture and exit")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.live:
+        args.fixture = None
+
+    if args.record:
+        record(args.record)
+        return
+    if args.child:
+        run_child(args.child, args)
+        return
+
+    collectors = [c for c in COLLECTORS if not args.only or c in args.only]
+    routes = [r for r in ROUTES if not args.only or r in args.only or r.split("?")[0] in args.only]
+    results: Dict[str, Any] = {
+        "meta": {
+            "commit": _commit(),
+            "created": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "fixture": os.path.relpath(args.fixture, _HERE) if args.fixture else "live",
+            "calls": args.calls,
+            "warmup": args.warmup,
+            "no_cache": args.no_cache,
+        },
+        "collectors": {},
+        "routes": {},
+    }
+    for name in collectors:
+        results["collectors"][name] = _spawn("collector:" + name, args)
+    for path in routes:
+        results["routes"][path] = _spawn("route:" + path, args)
+
+    base = None
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        print("compared with %s (%s)" % (args.compare, base.get("meta", {}).get("commit")))
+    _report(results, base)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Compare per-call cost of the WiFi collector backends.
+
+Times the in-process backend (wireless-extension ioctls plus
+/proc/net/wireless) against the command-line backend (iwconfig, iwgetid,
+nmcli) on the same interface, bypassing the result cache.
+
+Usage (from the agent directory, on a host with a wireless interface):
+
+    python benchmarks/bench_wifi.py --interface wlan0 --calls 50
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Callable, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from piwatch_agent.collectors import wifi  # noqa: E402
+
+
+def _time(fn: Callable[[], Any], calls: int) -> List[float]:
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return sorted(samples)
+
+
+def _report(label: str, samples: List[float]) -> None:
+    print(
+        "%-10s mean=%8.3fms  p50=%8.3fms  p99=%8.3fms"
+        % (
+            label,
+            sum(samples) / len(samples) * 1000,
+            samples[len(samples) // 2] * 1000,
+            samples[min(int(len(samples) * 0.99), len(samples) - 1)] * 1000,
+        )
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interface", default="wlan0")
+    parser.add_argument("--calls", type=int, default=50)
+    args = parser.parse_args()
+
+    direct = wifi._collect_direct(args.interface)
+    if direct is None:
+        print("note: %s does not answer wireless ioctls; the direct backend would fall back" % args.interface)
+    else:
+        print("direct:   %s" % direct)
+    print("commands: %s" % wifi._collect_commands(args.interface))
+
+    _report("direct", _time(lambda: wifi._collect_direct(args.interface), args.calls))
+    _report("commands", _time(lambda: wifi._collect_commands(args.interface), args.calls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import logging
+import operator
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("piwatch")
+
+
+def _disk_percent(disks: Any) -> Optional[float]:
+    percents = [d.get("percent") for d in disks or [] if d.get("percent") is not None]
+    return max(percents) if percents else None
+
+
+def _disk_root_percent(disks: Any) -> Optional[float]:
+    root = next((d for d in disks or [] if d.get("mountpoint") == "/"), None)
+    return root.get("percent") if root else None
+
+
+# Metric name -> (sampler section it comes from, extractor for that section)
+METRICS: Dict[str, Tuple[str, Callable[[Any], Optional[float]]]] = {
+    "cpu_percent": ("cpu", lambda cpu: cpu.get("usage_percent")),
+    "load_1min": ("cpu", lambda cpu: (cpu.get("load_avg") or {}).get("1min")),
+    "ram_percent": ("memory", lambda memory: (memory.get("ram") or {}).get("percent")),
+    "swap_percent": ("memory", lambda memory: (memory.get("swap") or {}).get("percent")),
+    "cpu_celsius": ("temperature", lambda temperature: temperature.get("cpu_celsius")),
+    "disk_percent": ("disk", _disk_percent),
+    "disk_root_percent": ("disk", _disk_root_percent),
+    "psi_cpu_some": ("pressure", lambda p: ((p.get("cpu") or {}).get("some") or {}).get("avg10")),
+    "psi_memory_some": ("pressure", lambda p: ((p.get("memory") or {}).get("some") or {}).get("avg10")),
+    "psi_io_some": ("pressure", lambda p: ((p.get("io") or {}).get("some") or {}).get("avg10")),
+}
+
+_OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+# The opposite of each condition, used to test the clear level
+_NEGATED = {">": operator.le, ">=": operator.lt, "<": operator.ge, "<=": operator.gt}
+
+# name: metric > threshold [for <seconds>] [clear <value>]
+_RULE = re.compile(
+    r"^\s*(?P<name>[\w.-]+)\s*:\s*(?P<metric>\w+)\s*(?P<op>[<>]=?)\s*(?P<threshold>-?[\d.]+)"
+    r"(?:\s+for\s+(?P<for>[\d.]+)s?)?(?:\s+clear\s+(?P<clear>-?[\d.]+))?\s*$"
+)
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class Rule:
+    """A threshold on one metric, with a hold duration and a clear level.
+
+    The rule fires once the condition has held for ``duration`` seconds
+    and resolves only when the value crosses back past ``clear`` (the
+    threshold itself by default), so a value hovering at the threshold
+    doesn't flap.
+    """
+
+    def __init__(self, name: str, metric: str, op: str, threshold: float,
+                 duration: float = 0.0, clear: Optional[float] = None) -> None:
+        if metric not in METRICS:
+            raise ValueError("unknown metric %r" % metric)
+        if op not in _OPERATORS:
+            raise ValueError("unknown operator %r" % op)
+        self.name = name
+        self.metric = metric
+        self.section, self._extract = METRICS[metric]
+        self.op = op
+        self.threshold = threshold
+        self.duration = duration
+        self.clear = threshold if clear is None else clear
+        above = op.startswith(">")
+        if (above and self.clear > threshold) or (not above and self.clear < threshold):
+            raise ValueError("clear level %s is on the wrong side of %s" % (self.clear, threshold))
+        self._breached = _OPERATORS[op]
+        # Resolved once the value is back on the far side of the clear level
+        self._cleared = _NEGATED[op]
+
+        self.state = "ok"
+        self.since: Optional[float] = None
+        self.value: Optional[float] = None
+
+    @classmethod
+    def parse(cls, text: str) -> "Rule":
+        """Parse ``"name: metric > threshold [for <seconds>] [clear <value>]"``."""
+        match = _RULE.match(text)
+        if match is None:
+            raise ValueError("expected 'name: metric > threshold [for N] [clear N]'")
+        return cls(
+            match.group("name"),
+            match.group("metric"),
+            match.group("op"),
+            float(match.group("threshold")),
+            float(match.group("for") or 0),
+            None if match.group("clear") is None else float(match.group("clear")),
+        )
+
+    def evaluate(self, section_value: Any, timestamp: float) -> Optional[str]:
+        """Apply one sample; return "firing" or "resolved" on a transition."""
+        try:
+            value = self._extract(section_value) if section_value else None
+        except (AttributeError, TypeError):
+            value = None
+        if value is None:
+            # No reading says nothing either way; keep the current state
+            return None
+        self.value = value
+
+        if self.state == "firing":
+            if self._cleared(value, self.clear):
+                self.state, self.since = "ok", timestamp
+                return "resolved"
+            return None
+        if not self._breached(value, self.threshold):
+            self.state, self.since = "ok", None
+            return None
+        if self.state == "ok":
+            self.state, self.since = "pending", timestamp
+        if timestamp - self.since >= self.duration:
+            self.state, self.since = "firing", timestamp
+            return "firing"
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rule": self.name,
+            "metric": self.metric,
+            "condition": "%s %s %g" % (self.metric, self.op, self.threshold),
+            "for_seconds": self.duration,
+            "clear": self.clear,
+            "state": self.state,
+            "since": None if self.since is None else _iso(self.since),
+            "value": self.value,
+        }
+
+
+def parse_rules(text: str) -> List[Rule]:
+    """Parse semicolon-separated rules, skipping (and logging) bad ones."""
+    rules = []
+    for item in text.split(";"):
+        if not item.strip():
+            continue
+        try:
+            rules.append(Rule.parse(item))
+        except ValueError as e:
+            logger.warning("PIWATCH_ALERT_RULES: ignoring %r: %s", item.strip(), e)
+    return rules
+
+
+class AlertEngine:
+    """Evaluate alert rules against every sample as the sampler takes it.
+
+    Register ``on_sample`` as a sampler listener: each sample is checked
+    against the rules on its section only, so alerts fire at sample
+    resolution without anyone polling. State changes are appended to a
+    bounded event log, numbered so clients can fetch just the new ones
+    with a cursor.
+    """
+
+    def __init__(self, rules: List[Rule], max_events: int = 500) -> None:
+        self.rules = rules
+        self._by_section: Dict[str, List[Rule]] = {}
+        for rule in rules:
+            self._by_section.setdefault(rule.section, []).append(rule)
+        self._lock = threading.Lock()
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=max(max_events, 1))
+        # As with Sampler cursors, the instance id invalidates old cursors
+        self.instance = "%x" % int(time.time() * 1000)
+        self._seq = 0
+
+    def on_sample(self, name: str, value: Any, timestamp: float) -> None:
+        rules = self._by_section.get(name)
+        if not rules:
+            return
+        with self._lock:
+            for rule in rules:
+                transition = rule.evaluate(value, timestamp)
+                if transition is None:
+                    continue
+                self._seq += 1
+                self._events.append({
+                    "seq": self._seq,
+                    "timestamp": _iso(timestamp),
+                    "rule": rule.name,
+                    "metric": rule.metric,
+                    "state": transition,
+                    "value": rule.value,
+                    "threshold": rule.threshold if transition == "firing" else rule.clear,
+                })
+                log = logger.warning if transition == "firing" else logger.info
+                log("Alert %s %s: %s = %s", rule.name, transition, rule.metric, rule.value)
+
+    def cursor(self) -> str:
+        with self._lock:
+            return "%s-%d" % (self.instance, self._seq)
+
+    def since(self, cursor: Optional[str]) -> Dict[str, Any]:
+        """Return every rule's state and the events after ``cursor``.
+
+        An unknown cursor (malformed, or from a previous agent run) gets the
+        whole log with ``"reset": true``. ``"truncated": true`` means events
+        after the cursor have already been dropped from the bounded log.
+        """
+        with self._lock:
+            instance, _, seq_text = (cursor or "").rpartition("-")
+            try:
+                seq: Optional[int] = int(seq_text)
+            except ValueError:
+                seq = None
+            reset = cursor is not None and (seq is None or instance != self.instance or seq > self._seq)
+            if seq is None or reset:
+                seq = 0
+            events = [event for event in self._events if event["seq"] > seq]
+            oldest = self._events[0]["seq"] if self._events else self._seq + 1
+            return {
+                "cursor": "%s-%d" % (self.instance, self._seq),
+                "reset": reset,
+                "truncated": oldest > seq + 1,
+                "active": [rule.to_dict() for rule in self.rules if rule.state == "firing"],
+                "rules": [rule.to_dict() for rule in self.rules],
+                "events": events,
+            }
@@ -1,17 +1,32 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, List, Optional
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
 import psutil
 
+from piwatch_agent import config
 
-def collect() -> Dict[str, Any]:
-    """Collect CPU usage, frequency, and load average."""
-    per_core = psutil.cpu_percent(interval=1, percpu=True)
-    total = psutil.cpu_percent(interval=0)
+_local = threading.local()
 
-    freq: Optional[Dict[str, float]] = None
+# (monotonic time read, frequency dict) of the last cpu_freq() call
+_freq_cache: Tuple[float, Optional[Dict[str, float]]] = (float("-inf"), None)
+
+
+def _frequency() -> Optional[Dict[str, float]]:
+    """Return the CPU frequency, re-read at most every CPU_FREQ_TTL seconds.
+
+    psutil reads several sysfs files per core for this, which adds up when
+    cpu is sampled every second on a small board.
+    """
+    global _freq_cache
+    read_at, freq = _freq_cache
+    now = time.monotonic()
+    if now - read_at < config.CPU_FREQ_TTL:
+        return freq
+    freq = None
     cpu_freq = psutil.cpu_freq()
     if cpu_freq is not None:
         freq = {
@@ -19,6 +34,54 @@ def collect() -> Dict[str, Any]:
             "min_mhz": round(cpu_freq.min, 1),
             "max_mhz": round(cpu_freq.max, 1),
         }
+    _freq_cache = (now, freq)
+    return freq
+
+
+def _busy(times: Any) -> Tuple[float, float]:
+    """Return (busy, total) seconds from one cpu_times() entry, as psutil counts them."""
+    total = sum(times)
+    # Guest time is already included in user and nice
+    total -= getattr(times, "guest", 0.0) + getattr(times, "guest_nice", 0.0)
+    return total - times.idle - getattr(times, "iowait", 0.0), total
+
+
+def _percent(busy: float, total: float) -> float:
+    return min(max(busy / total * 100.0, 0.0), 100.0) if total > 0 else 0.0
+
+
+def collect(interval: Optional[float] = 1) -> Dict[str, Any]:
+    """Collect CPU usage, frequency, and load average.
+
+    With ``interval=None`` usage is measured since the previous call made
+    from the same thread instead of sleeping, which is how the background
+    sampler calls it. psutil's own cpu_percent() baseline is shared by the
+    whole process, so each thread keeps its own cpu_times() baseline here
+    and a /metrics request can't shorten the sampler's window.
+    """
+    prev = getattr(_local, "times", None) if interval is None else None
+    if prev is None:
+        # No baseline yet for this thread (or a fixed window was asked for)
+        prev = psutil.cpu_times(percpu=True)
+        time.sleep(0.5 if interval is None else interval)
+    times = psutil.cpu_times(percpu=True)
+    if len(times) != len(prev):
+        # A core went on- or offline; measure a fresh window
+        prev = times
+        time.sleep(0.5 if interval is None else interval)
+        times = psutil.cpu_times(percpu=True)
+    _local.times = times
+
+    per_core = []
+    busy_sum = total_sum = 0.0
+    for before, after in zip(prev, times):
+        busy_before, total_before = _busy(before)
+        busy_after, total_after = _busy(after)
+        busy, total = busy_after - busy_before, total_after - total_before
+        per_core.append(_percent(busy, total))
+        busy_sum += busy
+        total_sum += total
+    total = _percent(busy_sum, total_sum)
 
     load1, load5, load15 = os.getloadavg()
 
@@ -26,7 +89,7 @@ def collect() -> Dict[str, Any]:
         "usage_percent": round(total, 1),
         "per_core_percent": [round(c, 1) for c in per_core],
         "core_count": psutil.cpu_count(logical=True),
-        "frequency": freq,
+        "frequency": _frequency(),
         "load_avg": {
             "1min": round(load1, 2),
             "5min": round(load5, 2),
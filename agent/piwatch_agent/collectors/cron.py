@@ -3,7 +3,10 @@ from __future__ import annotations
 import os
 import re
 import subprocess
-from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from piwatch_agent import cronexpr
 
 # Cron time field pattern: number, *, ranges, steps, lists
 _TIME_FIELD = r"[\d*,/\-]+"
@@ -20,26 +23,59 @@ _CRON_SPECIAL_RE = re.compile(r"^@(reboot|hourly|daily|weekly|monthly|yearly|ann
 # Shells that indicate a real user
 _VALID_SHELLS = ("/bin/bash", "/bin/zsh", "/bin/sh", "/usr/bin/bash", "/usr/bin/zsh")
 
+_PASSWD = "/etc/passwd"
+_SYSTEM_CRONTAB = "/etc/crontab"
+_CRON_D = "/etc/cron.d"
 
-def _get_users_with_shells() -> List[str]:
-    """Read /etc/passwd and return usernames with valid login shells."""
+# Per-user crontab spools (Debian/Raspberry Pi OS first, then RHEL-style)
+_SPOOL_DIRS = ("/var/spool/cron/crontabs", "/var/spool/cron")
+
+# Header that `crontab` writes into spool files and `crontab -l` hides
+_SPOOL_HEADER = "# DO NOT EDIT THIS FILE"
+
+# path -> (mtime_ns, size, parsed value)
+_file_cache: Dict[str, Tuple[int, int, Any]] = {}
+# spool dir -> (mtime_ns, file names)
+_dir_cache: Dict[str, Tuple[int, List[str]]] = {}
+
+
+def _read_cached(path: str, parse: Callable[[str], Any]) -> Any:
+    """Return ``parse(contents)`` for a file, re-reading only when it changed.
+
+    Raises OSError if the file can't be stat'ed or read.
+    """
+    st = os.stat(path)
+    cached = _file_cache.get(path)
+    if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    with open(path, "r") as f:
+        value = parse(f.read())
+    _file_cache[path] = (st.st_mtime_ns, st.st_size, value)
+    return value
+
+
+def _parse_passwd(text: str) -> List[str]:
     users = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.split(":")
+        if len(parts) >= 7:
+            username = parts[0]
+            shell = parts[6]
+            if shell in _VALID_SHELLS:
+                users.append(username)
+    return users
+
+
+def _get_users_with_shells() -> List[str]:
+    """Return usernames with valid login shells, re-reading /etc/passwd only when it changed."""
     try:
-        with open("/etc/passwd", "r") as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith("#"):
-                    continue
-                parts = line.split(":")
-                if len(parts) >= 7:
-                    username = parts[0]
-                    shell = parts[6]
-                    if shell in _VALID_SHELLS:
-                        users.append(username)
+        return _read_cached(_PASSWD, _parse_passwd)
     except (FileNotFoundError, PermissionError):
         # Fallback: try common users
-        users = ["root", "pi"]
-    return users
+        return ["root", "pi"]
 
 
 def _parse_crontab_line(line: str) -> Optional[Dict[str, Any]]:
@@ -92,13 +128,28 @@ def _try_parse_schedule(text: str, enabled: bool) -> Optional[Dict[str, Any]]:
     return None
 
 
+def _parse_user_crontab(raw: str) -> Dict[str, Any]:
+    """Parse crontab text into a dict with 'raw' and 'jobs'."""
+    jobs = []  # type: List[Dict[str, Any]]
+    for line in raw.splitlines():
+        entry = _parse_crontab_line(line)
+        if entry is not None:
+            jobs.append(entry)
+    return {"raw": raw, "jobs": jobs}
+
+
+def _parse_spool_file(text: str) -> Dict[str, Any]:
+    """Parse a spool file, dropping the header like ``crontab -l`` does."""
+    if text.startswith(_SPOOL_HEADER):
+        text = "".join(text.splitlines(True)[3:])
+    return _parse_user_crontab(text)
+
+
 def _get_user_crontab(user: str) -> Dict[str, Any]:
     """Get crontab data for a specific user.
 
     Returns a dict with 'raw' (full crontab text) and 'jobs' (parsed entries).
     """
-    jobs = []  # type: List[Dict[str, Any]]
-    raw = ""
     try:
         result = subprocess.run(
             ["crontab", "-l", "-u", user],
@@ -107,70 +158,152 @@ def _get_user_crontab(user: str) -> Dict[str, Any]:
             timeout=5,
         )
         if result.returncode == 0:
-            raw = result.stdout
-            for line in raw.splitlines():
-                entry = _parse_crontab_line(line)
-                if entry is not None:
-                    jobs.append(entry)
+            return _parse_user_crontab(result.stdout)
     except (FileNotFoundError, subprocess.TimeoutExpired):
         pass
-    return {"raw": raw, "jobs": jobs}
+    return {"raw": "", "jobs": []}
+
+
+def _find_spool_dir() -> Optional[str]:
+    """Return the crontab spool directory if it exists and is readable."""
+    for spool in _SPOOL_DIRS:
+        if os.path.isdir(spool):
+            return spool if os.access(spool, os.R_OK | os.X_OK) else None
+    return None
+
+
+def _get_spool_crontabs(spool: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Read every user's crontab straight from the spool directory.
+
+    Unchanged files cost one stat each. Returns None if any file can't be
+    read, so the caller can fall back to ``crontab -l``.
+    """
+    try:
+        st = os.stat(spool)
+        cached = _dir_cache.get(spool)
+        if cached is not None and cached[0] == st.st_mtime_ns:
+            names = cached[1]
+        else:
+            names = sorted(
+                name for name in os.listdir(spool)
+                if not name.startswith((".", "tmp.")) and os.path.isfile(os.path.join(spool, name))
+            )
+            _dir_cache[spool] = (st.st_mtime_ns, names)
+    except OSError:
+        return None
+
+    users = {}  # type: Dict[str, Dict[str, Any]]
+    for name in names:
+        try:
+            users[name] = _read_cached(os.path.join(spool, name), _parse_spool_file)
+        except FileNotFoundError:
+            continue
+        except OSError:
+            return None
+    return users
 
 
 def _get_system_crontabs() -> List[Dict[str, Any]]:
     """Parse /etc/crontab and /etc/cron.d/* entries."""
     jobs = []  # type: List[Dict[str, Any]]
-    files = ["/etc/crontab"]
+    files = [_SYSTEM_CRONTAB]
 
-    cron_d = "/etc/cron.d"
-    if os.path.isdir(cron_d):
-        for name in os.listdir(cron_d):
-            filepath = os.path.join(cron_d, name)
+    if os.path.isdir(_CRON_D):
+        for name in os.listdir(_CRON_D):
+            filepath = os.path.join(_CRON_D, name)
             if os.path.isfile(filepath) and not name.startswith("."):
                 files.append(filepath)
 
     for filepath in files:
         try:
-            with open(filepath, "r") as f:
-                for line in f:
-                    stripped = line.strip()
-                    if not stripped or stripped.startswith("#"):
-                        continue
-                    # System crontab has user as 6th field
-                    parts = stripped.split(None, 6)
-                    if len(parts) >= 7:
-                        schedule = " ".join(parts[:5])
-                        user = parts[5]
-                        command = parts[6]
-                        jobs.append({
-                            "user": user,
-                            "schedule": schedule,
-                            "command": command,
-                            "enabled": True,
-                        })
+            jobs.extend(_read_cached(filepath, _parse_system_crontab))
         except (FileNotFoundError, PermissionError):
             continue
 
     return jobs
 
 
+def _parse_system_crontab(text: str) -> List[Dict[str, Any]]:
+    """Parse a system crontab, which has the user as the 6th field."""
+    jobs = []  # type: List[Dict[str, Any]]
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        # System crontab has user as 6th field
+        parts = stripped.split(None, 6)
+        if len(parts) >= 7:
+            schedule = " ".join(parts[:5])
+            user = parts[5]
+            command = parts[6]
+            jobs.append({
+                "user": user,
+                "schedule": schedule,
+                "command": command,
+                "enabled": True,
+            })
+    return jobs
+
+
+def _iso_utc(t: Optional[datetime]) -> Optional[str]:
+    if t is None:
+        return None
+    return t.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _with_run_times(jobs: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+    """Return copies of ``jobs`` with 'next_run' and 'prev_run' added.
+
+    Schedules are evaluated in the host's local time, as cron does. Disabled
+    jobs, @reboot and unparseable schedules get None.
+    """
+    result = []
+    for job in jobs:
+        next_run = prev_run = None
+        if job.get("enabled"):
+            try:
+                expr = cronexpr.parse(job["schedule"])
+            except ValueError:
+                pass
+            else:
+                next_run = _iso_utc(expr.next_run(now))
+                prev_run = _iso_utc(expr.prev_run(now))
+        result.append(dict(job, next_run=next_run, prev_run=prev_run))
+    return result
+
+
 def collect() -> Dict[str, Any]:
     """Collect all cron jobs from the system.
 
     Returns a dict with 'users' (per-user crontabs) and 'system' (system-wide
-    crontab entries from /etc/crontab and /etc/cron.d/).
+    crontab entries from /etc/crontab and /etc/cron.d/). Every job carries
+    its 'next_run' and 'prev_run' times.
     """
+    now = datetime.now()
     users_data = {}  # type: Dict[str, Any]
 
-    # Iterate all users with valid login shells
-    for user in _get_users_with_shells():
-        user_data = _get_user_crontab(user)
+    # Read the spool directly when we can; it covers every user with a
+    # crontab in a handful of stat calls. Otherwise ask crontab per user.
+    # Either way only users with a login shell are reported.
+    users = _get_users_with_shells()
+    spool = _find_spool_dir()
+    crontabs = _get_spool_crontabs(spool) if spool is not None else None
+    if crontabs is None:
+        crontabs = {user: _get_user_crontab(user) for user in users}
+    else:
+        allowed = set(users)
+        crontabs = {user: data for user, data in crontabs.items() if user in allowed}
+
+    for user, user_data in crontabs.items():
         # Only include users that have a crontab (non-empty raw or jobs)
         if user_data["raw"] or user_data["jobs"]:
-            users_data[user] = user_data
+            users_data[user] = {
+                "raw": user_data["raw"],
+                "jobs": _with_run_times(user_data["jobs"], now),
+            }
 
     # System crontabs
-    system_jobs = _get_system_crontabs()
+    system_jobs = _with_run_times(_get_system_crontabs(), now)
 
     return {
         "users": users_data,
@@ -5,14 +5,26 @@ from typing import Any, Dict, List
 import psutil
 
 
+# Read-only images are always "full" and say nothing about free space
+_SKIP_FSTYPES = frozenset(("squashfs", "iso9660", "udf"))
+
+
 def collect() -> List[Dict[str, Any]]:
-    """Collect disk partition usage."""
+    """Collect disk partition usage.
+
+    Each device is reported once, at its first mountpoint: bind mounts and
+    repeated mounts of the same filesystem would only stat it again.
+    """
     partitions = []
+    seen = set()
     for part in psutil.disk_partitions(all=False):
+        if part.device in seen or part.fstype in _SKIP_FSTYPES or part.device.startswith("/dev/loop"):
+            continue
         try:
             usage = psutil.disk_usage(part.mountpoint)
         except PermissionError:
             continue
+        seen.add(part.device)
         partitions.append({
             "device": part.device,
             "mountpoint": part.mountpoint,
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import os
+import time
+from typing import Any, Dict, Optional, Set
+
+from piwatch_agent.rates import CounterRates
+
+_DISKSTATS = "/proc/diskstats"
+_SYS_BLOCK = "/sys/block"
+
+# /proc/diskstats always counts 512-byte sectors, whatever the device uses
+_SECTOR_BYTES = 512
+
+# Never interesting and often numerous
+_SKIP_PREFIXES = ("loop", "ram")
+
+# The kernel prints the time fields as 32-bit %u even on 64-bit kernels, so
+# they wrap at 2**32 ms (about 50 days of I/O time) everywhere
+_rates = CounterRates(widths={"read_ms": 32, "write_ms": 32, "busy_ms": 32})
+
+
+def _whole_disks() -> Optional[Set[str]]:
+    """Return names of whole block devices, or None if sysfs isn't readable."""
+    try:
+        return set(os.listdir(_SYS_BLOCK))
+    except OSError:
+        return None
+
+
+def _read_diskstats() -> Dict[str, Dict[str, int]]:
+    """Parse /proc/diskstats into {device: counters} for whole disks."""
+    disks = _whole_disks()
+    devices = {}
+    with open(_DISKSTATS) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 14:
+                continue
+            name = fields[2]
+            if name.startswith(_SKIP_PREFIXES):
+                continue
+            if disks is not None and name not in disks:
+                # A partition; its I/O is already counted by its disk
+                continue
+            devices[name] = {
+                "reads": int(fields[3]),
+                "read_sectors": int(fields[5]),
+                "read_ms": int(fields[6]),
+                "writes": int(fields[7]),
+                "write_sectors": int(fields[9]),
+                "write_ms": int(fields[10]),
+                "busy_ms": int(fields[12]),
+            }
+    return devices
+
+
+def _round(value: Optional[float], digits: int = 1) -> Optional[float]:
+    return None if value is None else round(value, digits)
+
+
+def collect() -> Dict[str, Any]:
+    """Collect per-disk throughput, IOPS, await and utilization.
+
+    Rates are computed against the previous call, so the first call (and
+    the first call after a device appears or its counters reset) reports
+    None rates alongside the cumulative byte counters.
+    """
+    now = time.monotonic()
+    devices = _read_diskstats()
+    _rates.retain(devices)
+
+    result = {}
+    for name, counters in devices.items():
+        elapsed, d = _rates.update(name, counters, now)
+        entry: Dict[str, Any] = {
+            "read_bytes": counters["read_sectors"] * _SECTOR_BYTES,
+            "write_bytes": counters["write_sectors"] * _SECTOR_BYTES,
+            "read_bytes_per_sec": None,
+            "write_bytes_per_sec": None,
+            "read_iops": None,
+            "write_iops": None,
+            "await_ms": None,
+            "util_percent": None,
+        }
+        if elapsed is not None and None not in d.values():
+            ios = d["reads"] + d["writes"]
+            entry.update({
+                "read_bytes_per_sec": _round(d["read_sectors"] * _SECTOR_BYTES / elapsed),
+                "write_bytes_per_sec": _round(d["write_sectors"] * _SECTOR_BYTES / elapsed),
+                "read_iops": _round(d["reads"] / elapsed),
+                "write_iops": _round(d["writes"] / elapsed),
+                "await_ms": _round((d["read_ms"] + d["write_ms"]) / ios, 2) if ios else 0.0,
+                "util_percent": _round(min(d["busy_ms"] / (elapsed * 10), 100.0)),
+            })
+        result[name] = entry
+    return {"devices": result}
@@ -1,12 +1,240 @@
 from __future__ import annotations
 
+import http.client
 import json
+import logging
+import os
+import socket
 import subprocess
+import threading
+import time
 from typing import Any, Dict, List, Optional
+from urllib.parse import quote
 
+from piwatch_agent import config
 
-def collect() -> Optional[Dict[str, Any]]:
-    """Collect Docker container information. Returns None if Docker is not available."""
+logger = logging.getLogger("piwatch")
+
+_EVENTS_FILTER = quote(json.dumps({"type": ["container"]}))
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that connects to a Unix domain socket."""
+
+    def __init__(self, path: str, timeout: Optional[float] = None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self._socket_path = path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self._socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class DockerError(Exception):
+    """Raised when the Docker Engine API can't be reached or errors."""
+
+
+class DockerClient:
+    """Minimal Docker Engine API client over the Unix socket.
+
+    Keeps one HTTP/1.1 connection open across calls and reconnects once if
+    the daemon has closed it. Optionally follows ``/events`` in a background
+    thread so the container list is only re-fetched after something changed.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 5.0) -> None:
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._conn: Optional[_UnixHTTPConnection] = None
+        self._lock = threading.Lock()
+        self._containers: Optional[List[Dict[str, Any]]] = None
+        self._fetched_at = 0.0
+        self._dirty = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._prev_cpu: Dict[str, Any] = {}
+
+    def available(self) -> bool:
+        """Whether the socket exists and we are allowed to talk to it."""
+        return os.access(self.socket_path, os.R_OK | os.W_OK)
+
+    def _get(self, path: str) -> Any:
+        with self._lock:
+            for attempt in (0, 1):
+                if self._conn is None:
+                    self._conn = _UnixHTTPConnection(self.socket_path, self.timeout)
+                try:
+                    self._conn.request("GET", path)
+                    resp = self._conn.getresponse()
+                    body = resp.read()
+                except (OSError, http.client.HTTPException) as e:
+                    self._conn.close()
+                    self._conn = None
+                    if attempt:
+                        raise DockerError(str(e))
+                    continue
+                if resp.status >= 400:
+                    raise DockerError("GET %s returned %d" % (path, resp.status))
+                try:
+                    return json.loads(body)
+                except ValueError as e:
+                    raise DockerError("Invalid JSON from %s: %s" % (path, e))
+        raise DockerError("unreachable")
+
+    def containers(self, max_age: float = 0.0) -> List[Dict[str, Any]]:
+        """Return all containers, reusing the cached list while it is fresh.
+
+        The cache is only trusted while the events watcher is running, since
+        nothing else tells us a container changed.
+        """
+        watching = self._watcher is not None and self._watcher.is_alive()
+        if (
+            watching
+            and self._containers is not None
+            and not self._dirty.is_set()
+            and time.monotonic() - self._fetched_at < max_age
+        ):
+            return self._containers
+        self._dirty.clear()
+        raw = self._get("/containers/json?all=1")
+        self._containers = [_format_container(c) for c in raw]
+        self._fetched_at = time.monotonic()
+        return self._containers
+
+    def stats(self, container_id: str) -> Dict[str, Any]:
+        """Return CPU and memory usage for one running container.
+
+        CPU% is computed against this client's previous reading of the same
+        container, so one-shot stats work without a second daemon sample.
+        """
+        raw = self._get("/containers/%s/stats?stream=false&one-shot=true" % container_id)
+        cpu_stats = raw.get("cpu_stats") or {}
+        total = (cpu_stats.get("cpu_usage") or {}).get("total_usage")
+        system = cpu_stats.get("system_cpu_usage")
+        online = cpu_stats.get("online_cpus") or len((cpu_stats.get("cpu_usage") or {}).get("percpu_usage") or []) or 1
+
+        cpu_percent = None
+        prev = self._prev_cpu.get(container_id)
+        if total is not None and system is not None:
+            if prev is not None and system > prev[1] and total >= prev[0]:
+                cpu_percent = round((total - prev[0]) / (system - prev[1]) * online * 100.0, 1)
+            self._prev_cpu[container_id] = (total, system)
+
+        mem = raw.get("memory_stats") or {}
+        usage = mem.get("usage")
+        limit = mem.get("limit")
+        if usage is not None:
+            # Page cache is reclaimable; report what `docker stats` shows
+            extra = mem.get("stats") or {}
+            usage -= extra.get("inactive_file", extra.get("cache", 0))
+        mem_percent = round(usage / limit * 100.0, 1) if usage is not None and limit else None
+
+        return {
+            "cpu_percent": cpu_percent,
+            "memory_bytes": usage,
+            "memory_limit_bytes": limit,
+            "memory_percent": mem_percent,
+        }
+
+    def forget(self, keep: List[str]) -> None:
+        """Drop CPU baselines for containers that no longer exist."""
+        for container_id in list(self._prev_cpu):
+            if container_id not in keep:
+                del self._prev_cpu[container_id]
+
+    def watch_events(self) -> None:
+        """Start a daemon thread that marks the cache dirty on container events."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._watcher = threading.Thread(target=self._watch_loop, name="docker-events", daemon=True)
+        self._watcher.start()
+
+    def _watch_loop(self) -> None:
+        backoff = 1.0
+        while True:
+            conn = _UnixHTTPConnection(self.socket_path, timeout=None)
+            try:
+                conn.request("GET", "/events?filters=%s" % _EVENTS_FILTER)
+                resp = conn.getresponse()
+                if resp.status != 200:
+                    raise DockerError("GET /events returned %d" % resp.status)
+                # Anything we missed while disconnected is covered by a refetch
+                self._dirty.set()
+                backoff = 1.0
+                while True:
+                    line = resp.readline()
+                    if not line:
+                        break
+                    self._dirty.set()
+            except (OSError, http.client.HTTPException, DockerError) as e:
+                logger.debug("Docker events stream failed: %s", e)
+            finally:
+                conn.close()
+            self._dirty.set()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
+
+
+def _format_ports(ports: List[Dict[str, Any]]) -> str:
+    """Render API port mappings the way ``docker ps`` does."""
+    parts = []
+    for p in sorted(ports, key=lambda p: (p.get("PrivatePort", 0), p.get("IP", ""))):
+        private = "%s/%s" % (p.get("PrivatePort"), p.get("Type", "tcp"))
+        if p.get("PublicPort"):
+            parts.append("%s:%s->%s" % (p.get("IP") or "0.0.0.0", p["PublicPort"], private))
+        else:
+            parts.append(private)
+    return ", ".join(parts)
+
+
+def _format_container(c: Dict[str, Any]) -> Dict[str, Any]:
+    """Map an Engine API container to the fields ``docker ps`` reports."""
+    names = c.get("Names") or []
+    return {
+        "id": (c.get("Id") or "")[:12],
+        "name": names[0].lstrip("/") if names else "",
+        "image": c.get("Image", ""),
+        "status": c.get("Status", ""),
+        "ports": _format_ports(c.get("Ports") or []),
+        "state": c.get("State", ""),
+    }
+
+
+_client = DockerClient(config.DOCKER_SOCKET)
+
+
+def _collect_api() -> Dict[str, Any]:
+    if config.DOCKER_EVENTS:
+        _client.watch_events()
+    containers = _client.containers(max_age=config.DOCKER_MAX_AGE)
+
+    if config.DOCKER_STATS:
+        # Copy so per-container stats don't leak into the cached list
+        containers = [dict(c) for c in containers]
+        running = []
+        for c in containers:
+            if c["state"] != "running":
+                continue
+            running.append(c["id"])
+            try:
+                c["stats"] = _client.stats(c["id"])
+            except DockerError:
+                c["stats"] = None
+        _client.forget(running)
+
+    return {
+        "available": True,
+        "containers": containers,
+        "container_count": len(containers),
+    }
+
+
+def _collect_cli() -> Optional[Dict[str, Any]]:
     containers: List[Dict[str, Any]] = []
     try:
         result = subprocess.run(
@@ -31,3 +259,18 @@ def collect() -> Optional[Dict[str, Any]]:
         "containers": containers,
         "container_count": len(containers),
     }
+
+
+def collect() -> Optional[Dict[str, Any]]:
+    """Collect Docker container information. Returns None if Docker is not available.
+
+    Talks to the Engine API over the Unix socket when it exists, and only
+    falls back to forking the ``docker`` CLI when it doesn't.
+    """
+    if not _client.available():
+        return _collect_cli()
+    try:
+        return _collect_api()
+    except DockerError as e:
+        logger.debug("Docker API unavailable: %s", e)
+        return None
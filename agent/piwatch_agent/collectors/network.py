@@ -1,28 +1,39 @@
 from __future__ import annotations
 
+import fnmatch
 import socket
+import time
 from typing import Any, Dict
 
 import psutil
 
+from piwatch_agent import config
+from piwatch_agent import hostinfo
+from piwatch_agent.rates import CounterRates
 
-def _get_default_ip() -> str:
-    """Get the default outgoing IP address."""
-    try:
-        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-            s.connect(("8.8.8.8", 80))
-            return s.getsockname()[0]
-    except OSError:
-        return "127.0.0.1"
+_rates = CounterRates()
+
+
+def _excluded(iface: str) -> bool:
+    return any(fnmatch.fnmatchcase(iface, pattern) for pattern in config.NET_EXCLUDE)
 
 
 def collect() -> Dict[str, Any]:
-    """Collect network interface I/O statistics."""
-    counters = psutil.net_io_counters(pernic=True)
+    """Collect network interface I/O statistics and rates.
+
+    Cumulative counters are reported as the kernel has them; the
+    ``*_per_sec`` rates are computed against the previous call and are
+    None on an interface's first sample or after its counters reset.
+    """
+    now = time.monotonic()
+    counters = psutil.net_io_counters(pernic=True, nowrap=False)
     addrs = psutil.net_if_addrs()
+    _rates.retain(counters)
 
     interfaces = {}
     for iface, stats in counters.items():
+        if _excluded(iface):
+            continue
         ip = None
         if iface in addrs:
             for addr in addrs[iface]:
@@ -30,15 +41,23 @@ def collect() -> Dict[str, Any]:
                     ip = addr.address
                     break
 
-        interfaces[iface] = {
+        values = {
             "bytes_sent": stats.bytes_sent,
             "bytes_recv": stats.bytes_recv,
             "packets_sent": stats.packets_sent,
             "packets_recv": stats.packets_recv,
-            "ip_address": ip,
+            "errors_in": stats.errin,
+            "errors_out": stats.errout,
+            "drops_in": stats.dropin,
+            "drops_out": stats.dropout,
         }
+        rates = _rates.rates(iface, values, now)
+        entry: Dict[str, Any] = dict(values, ip_address=ip)
+        for key, rate in rates.items():
+            entry[key + "_per_sec"] = None if rate is None else round(rate, 1)
+        interfaces[iface] = entry
 
     return {
-        "default_ip": _get_default_ip(),
+        "default_ip": hostinfo.default_ip(),
         "interfaces": interfaces,
     }
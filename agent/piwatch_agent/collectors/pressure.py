@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import subprocess
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from piwatch_agent import config
+
+_PRESSURE_DIR = "/proc/pressure"
+_RESOURCES = ("cpu", "memory", "io")
+
+# Exposed by the raspberrypi firmware driver on recent kernels
+_THROTTLED_SYSFS = "/sys/devices/platform/soc/soc:firmware/get_throttled"
+
+# get_throttled bits: low half is the current state, bits 16+ latch once seen
+_THROTTLE_FLAGS = (
+    (0, "under_voltage"),
+    (1, "freq_capped"),
+    (2, "throttled"),
+    (3, "soft_temp_limit"),
+    (16, "under_voltage_occurred"),
+    (17, "freq_capped_occurred"),
+    (18, "throttled_occurred"),
+    (19, "soft_temp_limit_occurred"),
+)
+
+# (monotonic time read, raw value) of the last vcgencmd call
+_vcgencmd_cache: Tuple[float, Optional[int]] = (float("-inf"), None)
+_sysfs_missing = False
+
+
+def _read_psi(resource: str) -> Optional[Dict[str, Any]]:
+    """Parse /proc/pressure/<resource> into {"some": {...}, "full": {...}}."""
+    try:
+        with open("%s/%s" % (_PRESSURE_DIR, resource)) as f:
+            text = f.read()
+    except OSError:
+        return None
+    result: Dict[str, Any] = {}
+    for line in text.splitlines():
+        kind, _, rest = line.partition(" ")
+        fields = dict(item.split("=", 1) for item in rest.split() if "=" in item)
+        try:
+            result[kind] = {
+                "avg10": float(fields["avg10"]),
+                "avg60": float(fields["avg60"]),
+                "avg300": float(fields["avg300"]),
+                # Microseconds stalled since boot
+                "total_us": int(fields["total"]),
+            }
+        except (KeyError, ValueError):
+            continue
+    return result or None
+
+
+def _read_throttled_sysfs() -> Optional[int]:
+    global _sysfs_missing
+    if _sysfs_missing:
+        return None
+    try:
+        with open(_THROTTLED_SYSFS) as f:
+            return int(f.read().strip(), 16)
+    except FileNotFoundError:
+        _sysfs_missing = True
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _read_throttled_vcgencmd() -> Optional[int]:
+    """Run ``vcgencmd get_throttled`` at most every THROTTLE_CACHE_TTL seconds."""
+    global _vcgencmd_cache
+    read_at, value = _vcgencmd_cache
+    now = time.monotonic()
+    if now - read_at < config.THROTTLE_CACHE_TTL:
+        return value
+    value = None
+    try:
+        result = subprocess.run(
+            ["vcgencmd", "get_throttled"],
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+        if result.returncode == 0:
+            # Output: throttled=0x50000
+            value = int(result.stdout.strip().split("=")[1], 16)
+    except FileNotFoundError:
+        # Not a Pi (or no firmware tools): never try again
+        now = float("inf")
+    except (IndexError, ValueError, subprocess.TimeoutExpired):
+        pass
+    _vcgencmd_cache = (now, value)
+    return value
+
+
+def _throttling() -> Optional[Dict[str, Any]]:
+    raw = _read_throttled_sysfs()
+    if raw is None:
+        raw = _read_throttled_vcgencmd()
+    if raw is None:
+        return None
+    flags: Dict[str, Any] = {"raw": "0x%x" % raw}
+    for bit, name in _THROTTLE_FLAGS:
+        flags[name] = bool(raw & (1 << bit))
+    return flags
+
+
+def collect() -> Dict[str, Any]:
+    """Collect pressure stall information and Raspberry Pi throttling state.
+
+    Each PSI resource is None on kernels without PSI (or with it disabled),
+    and ``throttling`` is None off a Pi.
+    """
+    data: Dict[str, Any] = {resource: _read_psi(resource) for resource in _RESOURCES}
+    data["throttling"] = _throttling()
+    return data
@@ -1,27 +1,94 @@
 from __future__ import annotations
 
+import heapq
+import threading
 from typing import Any, Dict, List
 
 import psutil
 
+SORT_KEYS = {
+    "cpu": "cpu_percent",
+    "memory": "memory_percent",
+}
+
+
+class ProcessTracker:
+    """Keep psutil.Process objects alive between samples.
+
+    psutil reports CPU% as the delta since the previous call on the same
+    Process object, so a fresh object always reads 0.0. Reusing them gives
+    real numbers, and the name/username (which never change for a PID) are
+    read only once.
+    """
+
+    def __init__(self) -> None:
+        self._procs: Dict[int, psutil.Process] = {}
+        self._static: Dict[int, Dict[str, Any]] = {}
+        self._rows: List[Dict[str, Any]] = []
+        self._sampled = False
+        self._lock = threading.Lock()
+
+    def sample(self) -> None:
+        """Refresh CPU/memory for every process and drop exited PIDs."""
+        with self._lock:
+            seen = set()
+            rows: List[Dict[str, Any]] = []
+            for proc in psutil.process_iter():
+                pid = proc.pid
+                seen.add(pid)
+                cached = self._procs.get(pid)
+                # A recycled PID gets a new Process; is_running() compares create time
+                if cached is None or (cached is not proc and not cached.is_running()):
+                    self._procs[pid] = cached = proc
+                    self._static.pop(pid, None)
+                try:
+                    with cached.oneshot():
+                        static = self._static.get(pid)
+                        if static is None:
+                            try:
+                                username = cached.username()
+                            except (KeyError, psutil.AccessDenied):
+                                username = None
+                            static = {"name": cached.name(), "username": username}
+                            self._static[pid] = static
+                        rows.append({
+                            "pid": pid,
+                            "name": static["name"],
+                            "cpu_percent": round(cached.cpu_percent(interval=None), 1),
+                            "memory_percent": round(cached.memory_percent(), 1),
+                            "status": cached.status(),
+                            "username": static["username"],
+                        })
+                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                    continue
+
+            for pid in list(self._procs):
+                if pid not in seen:
+                    del self._procs[pid]
+                    self._static.pop(pid, None)
+
+            self._rows = rows
+            self._sampled = True
+
+    def top(self, limit: int = 15, sort: str = "cpu") -> List[Dict[str, Any]]:
+        """Return the top ``limit`` processes from the latest sample."""
+        key = SORT_KEYS[sort]
+        if not self._sampled:
+            self.sample()
+        with self._lock:
+            rows = self._rows
+        return heapq.nlargest(limit, rows, key=lambda p: p[key])
+
+
+_tracker = ProcessTracker()
+
 
 def collect(limit: int = 15) -> List[Dict[str, Any]]:
     """Collect top processes by CPU usage."""
-    procs: List[Dict[str, Any]] = []
-
-    for proc in psutil.process_iter(["pid", "name", "cpu_percent", "memory_percent", "status", "username"]):
-        try:
-            info = proc.info
-            procs.append({
-                "pid": info["pid"],
-                "name": info["name"],
-                "cpu_percent": round(info["cpu_percent"] or 0.0, 1),
-                "memory_percent": round(info["memory_percent"] or 0.0, 1),
-                "status": info["status"],
-                "username": info["username"],
-            })
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            continue
-
-    procs.sort(key=lambda p: p["cpu_percent"], reverse=True)
-    return procs[:limit]
+    _tracker.sample()
+    return _tracker.top(limit)
+
+
+def top(limit: int = 15, sort: str = "cpu") -> List[Dict[str, Any]]:
+    """Return top processes from the latest sample without re-reading /proc."""
+    return _tracker.top(limit, sort)
@@ -1,13 +1,137 @@
 from __future__ import annotations
 
+import errno
+import glob
+import os
 import subprocess
-from typing import Any, Dict, Optional
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-import psutil
+from piwatch_agent import config
+
+_THERMAL_DIR = "/sys/class/thermal"
+_HWMON_DIR = "/sys/class/hwmon"
+
+# Zone types / hwmon names that measure the CPU, best first
+_CPU_SENSORS = ("cpu-thermal", "cpu_thermal", "soc_thermal", "x86_pkg_temp", "coretemp", "k10temp", "cpu")
+
+# On a Raspberry Pi, `vcgencmd measure_temp` reads this same SoC sensor
+_PI_SOC_SENSOR = "cpu-thermal"
+
+# Errors that mean the sensor itself went away, rather than one bad read
+_GONE = (errno.ENODEV, errno.ENOENT, errno.EBADF, errno.ENXIO)
+
+
+def _read_text(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+class _Sensor:
+    __slots__ = ("name", "source", "node", "fd")
+
+    def __init__(self, name: str, source: str, node: str, fd: int) -> None:
+        self.name = name
+        self.source = source
+        # sysfs node ("thermal_zone3", "hwmon2/temp1"): unlike the name, unique
+        self.node = node
+        self.fd = fd
+
+
+class SensorSet:
+    """Temperature sensors found once in sysfs and re-read through open fds.
+
+    Discovery walks every thermal zone and hwmon temperature input, skipping
+    hwmon devices that only mirror a thermal zone. Each reading is then a
+    single ``pread`` at offset 0, which sysfs answers with a fresh value, so
+    no directory walk or open() happens per sample. If a sensor disappears
+    the set is discovered again on the next read.
+    """
+
+    def __init__(self, thermal_dir: str = _THERMAL_DIR, hwmon_dir: str = _HWMON_DIR) -> None:
+        self._thermal_dir = thermal_dir
+        self._hwmon_dir = hwmon_dir
+        self._sensors: Optional[List[_Sensor]] = None
+        self._lock = threading.Lock()
+
+    def _open(self, name: str, source: str, node: str, path: str) -> Optional[_Sensor]:
+        try:
+            return _Sensor(name, source, node, os.open(path, os.O_RDONLY))
+        except OSError:
+            return None
+
+    def _discover(self) -> List[_Sensor]:
+        sensors = []
+        zone_types = set()
+        for zone in sorted(glob.glob(os.path.join(self._thermal_dir, "thermal_zone*"))):
+            zone_type = _read_text(os.path.join(zone, "type")) or os.path.basename(zone)
+            sensor = self._open(zone_type, "thermal", os.path.basename(zone), os.path.join(zone, "temp"))
+            if sensor is not None:
+                sensors.append(sensor)
+                zone_types.add(zone_type.replace("-", "_"))
+
+        for hwmon in sorted(glob.glob(os.path.join(self._hwmon_dir, "hwmon*"))):
+            chip = _read_text(os.path.join(hwmon, "name")) or os.path.basename(hwmon)
+            if chip.replace("-", "_") in zone_types:
+                continue
+            inputs = sorted(glob.glob(os.path.join(hwmon, "temp*_input")))
+            for path in inputs:
+                prefix = path[:-len("_input")]
+                label = _read_text(prefix + "_label")
+                if label is None and len(inputs) > 1:
+                    label = os.path.basename(prefix)
+                name = "%s %s" % (chip, label) if label else chip
+                node = "%s/%s" % (os.path.basename(hwmon), os.path.basename(prefix))
+                sensor = self._open(name, "hwmon", node, path)
+                if sensor is not None:
+                    sensors.append(sensor)
+        return sensors
+
+    def _close(self) -> None:
+        for sensor in self._sensors or []:
+            try:
+                os.close(sensor.fd)
+            except OSError:
+                pass
+        self._sensors = None
+
+    def read(self) -> List[Tuple[str, str, str, Optional[float]]]:
+        """Return (name, source, node, celsius) for every sensor."""
+        with self._lock:
+            if self._sensors is None:
+                self._sensors = self._discover()
+            readings = []
+            gone = False
+            for sensor in self._sensors:
+                celsius = None
+                try:
+                    celsius = round(int(os.pread(sensor.fd, 32, 0)) / 1000.0, 1)
+                except OSError as e:
+                    gone = gone or e.errno in _GONE
+                except ValueError:
+                    pass
+                readings.append((sensor.name, sensor.source, sensor.node, celsius))
+            if gone:
+                self._close()
+            return readings
+
+
+# (monotonic time read, value) of the last vcgencmd call
+_vcgencmd_cache: Tuple[float, Optional[float]] = (float("-inf"), None)
 
 
 def _read_vcgencmd() -> Optional[float]:
-    """Try to read GPU temperature via vcgencmd."""
+    """Read the SoC temperature via vcgencmd, at most every TEMP_VCGENCMD_TTL seconds."""
+    global _vcgencmd_cache
+    read_at, value = _vcgencmd_cache
+    now = time.monotonic()
+    if now - read_at < config.TEMP_VCGENCMD_TTL:
+        return value
+    value = None
     try:
         result = subprocess.run(
             ["vcgencmd", "measure_temp"],
@@ -18,46 +142,50 @@ def _read_vcgencmd() -> Optional[float]:
         if result.returncode == 0:
             # Output: temp=42.0'C
             text = result.stdout.strip()
-            return float(text.split("=")[1].split("'")[0])
-    except (FileNotFoundError, IndexError, ValueError, subprocess.TimeoutExpired):
+            value = float(text.split("=")[1].split("'")[0])
+    except FileNotFoundError:
+        # No firmware tools: never try again
+        now = float("inf")
+    except (IndexError, ValueError, subprocess.TimeoutExpired):
         pass
-    return None
+    _vcgencmd_cache = (now, value)
+    return value
 
 
-def _read_thermal_zone() -> Optional[float]:
-    """Try to read CPU temperature from thermal zone."""
-    try:
-        with open("/sys/class/thermal/thermal_zone0/temp", "r") as f:
-            return round(int(f.read().strip()) / 1000.0, 1)
-    except (FileNotFoundError, ValueError, PermissionError):
-        pass
-    return None
+_sensors = SensorSet()
 
 
-def _read_psutil() -> Optional[float]:
-    """Try to read CPU temperature from psutil sensors."""
-    try:
-        temps = psutil.sensors_temperatures()
-        if not temps:
-            return None
-        for name in ("cpu_thermal", "cpu-thermal", "coretemp", "soc_thermal"):
-            if name in temps and temps[name]:
-                return round(temps[name][0].current, 1)
-        # Fallback: first available sensor
-        first_key = next(iter(temps))
-        if temps[first_key]:
-            return round(temps[first_key][0].current, 1)
-    except (AttributeError, StopIteration):
-        pass
+def _pick(readings: List[Tuple[str, str, str, Optional[float]]], names: Tuple[str, ...]) -> Optional[float]:
+    for wanted in names:
+        for name, _, _, celsius in readings:
+            if celsius is not None and name.split(" ")[0].lower() == wanted:
+                return celsius
     return None
 
 
 def collect() -> Dict[str, Any]:
-    """Collect CPU and GPU temperatures."""
-    cpu_temp = _read_thermal_zone() or _read_psutil()
-    gpu_temp = _read_vcgencmd()
+    """Collect CPU and GPU temperatures plus every sensor the kernel exposes.
+
+    ``vcgencmd`` is only used when sysfs has no temperature sensors at all.
+    """
+    readings = _sensors.read()
+    zones = [
+        {"name": name, "source": source, "node": node, "celsius": celsius}
+        for name, source, node, celsius in readings
+    ]
+
+    cpu_temp = _pick(readings, _CPU_SENSORS)
+    if cpu_temp is None:
+        cpu_temp = next((celsius for _, _, _, celsius in readings if celsius is not None), None)
+    gpu_temp = _pick(readings, ("gpu", "gpu_thermal", "gpu-thermal"))
+    if gpu_temp is None and _pick(readings, (_PI_SOC_SENSOR,)) is not None:
+        # The Pi's CPU and GPU share one die and one sensor
+        gpu_temp = cpu_temp
+    if not readings:
+        cpu_temp = gpu_temp = _read_vcgencmd()
 
     return {
         "cpu_celsius": cpu_temp,
         "gpu_celsius": gpu_temp,
+        "zones": zones,
     }
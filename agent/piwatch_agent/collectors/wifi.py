@@ -1,7 +1,28 @@
 from __future__ import annotations
 
+import array
+import fcntl
+import os
+import socket
+import struct
 import subprocess
-from typing import Any, Dict, Optional
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from piwatch_agent import config
+
+_PROC_WIRELESS = "/proc/net/wireless"
+_SYS_NET = "/sys/class/net"
+
+# Wireless extension ioctls (linux/wireless.h)
+_SIOCGIWFREQ = 0x8B05
+_SIOCGIWRATE = 0x8B21
+_SIOCGIWESSID = 0x8B1B
+_IW_ESSID_MAX_SIZE = 32
+_IWREQ_SIZE = 32
+
+# (monotonic time, result) of the last collect()
+_cache: Optional[Tuple[float, Dict[str, Any]]] = None
 
 
 def _run_cmd(cmd: list[str], timeout: int = 5) -> Optional[str]:
@@ -15,9 +36,9 @@ def _run_cmd(cmd: list[str], timeout: int = 5) -> Optional[str]:
     return None
 
 
-def _get_ssid() -> Optional[str]:
+def _get_ssid(interface: str) -> Optional[str]:
     """Get current WiFi SSID."""
-    output = _run_cmd(["iwgetid", "-r"])
+    output = _run_cmd(["iwgetid", "-r", interface])
     if output:
         return output
     # Fallback: try nmcli
@@ -29,52 +50,172 @@ def _get_ssid() -> Optional[str]:
     return None
 
 
-def _get_signal_strength() -> Optional[int]:
-    """Get WiFi signal strength in dBm."""
-    output = _run_cmd(["iwconfig", "wlan0"])
-    if output:
-        for line in output.splitlines():
-            if "Signal level" in line:
-                for part in line.split():
-                    if part.startswith("level="):
-                        try:
-                            return int(part.split("=")[1])
-                        except ValueError:
-                            pass
-    # Fallback: try /proc/net/wireless
+def _parse_iwconfig(output: Optional[str]) -> Dict[str, Any]:
+    """Pull signal level and frequency out of one ``iwconfig`` run."""
+    info: Dict[str, Any] = {"signal_dbm": None, "frequency": None}
+    if not output:
+        return info
+    for line in output.splitlines():
+        for part in line.split():
+            if part.startswith("level=") and info["signal_dbm"] is None:
+                try:
+                    info["signal_dbm"] = int(part.split("=")[1])
+                except ValueError:
+                    pass
+            elif part.startswith("Frequency:") and info["frequency"] is None:
+                info["frequency"] = part.split(":")[1]
+    return info
+
+
+def _read_proc_wireless(interface: str) -> Optional[Dict[str, Any]]:
+    """Read link quality and signal level for one interface from /proc/net/wireless."""
     try:
-        with open("/proc/net/wireless", "r") as f:
+        with open(_PROC_WIRELESS, "r") as f:
             lines = f.readlines()
-            if len(lines) >= 3:
-                fields = lines[2].split()
-                if len(fields) >= 4:
-                    return int(float(fields[3]))
-    except (FileNotFoundError, ValueError, IndexError):
-        pass
+    except (FileNotFoundError, PermissionError):
+        return None
+    for line in lines[2:]:
+        fields = line.split()
+        if len(fields) >= 4 and fields[0].rstrip(":") == interface:
+            try:
+                link = float(fields[2])
+                level = int(float(fields[3]))
+            except ValueError:
+                return None
+            return {
+                # cfg80211 reports link quality out of 70
+                "link_quality": round(min(link / 70.0, 1.0) * 100),
+                "signal_dbm": level,
+            }
     return None
 
 
-def _get_frequency() -> Optional[str]:
-    """Get WiFi frequency."""
-    output = _run_cmd(["iwconfig", "wlan0"])
-    if output:
-        for line in output.splitlines():
-            if "Frequency" in line:
-                for part in line.split():
-                    if part.startswith("Frequency:"):
-                        return part.split(":")[1]
-    return None
+def _iwreq(interface: str, data: bytes = b"") -> bytearray:
+    """Build a struct iwreq: 16-byte interface name plus a 16-byte union."""
+    req = bytearray(_IWREQ_SIZE)
+    name = interface.encode()[:15]
+    req[:len(name)] = name
+    req[16:16 + len(data)] = data
+    return req
 
 
-def collect() -> Dict[str, Any]:
-    """Collect current WiFi information."""
+def _ioctl_wireless(interface: str) -> Optional[Dict[str, Any]]:
+    """Read SSID, frequency and bitrate with wireless-extension ioctls.
+
+    These are the calls iwconfig/iwgetid make, done in-process on one
+    socket. Returns None if the interface isn't wireless (or the kernel
+    lacks wireless extensions).
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        fd = sock.fileno()
+
+        essid = array.array("B", bytes(_IW_ESSID_MAX_SIZE + 1))
+        address, _ = essid.buffer_info()
+        req = _iwreq(interface, struct.pack("PHH", address, len(essid), 0))
+        try:
+            fcntl.ioctl(fd, _SIOCGIWESSID, req)
+        except OSError:
+            return None
+        length = struct.unpack_from("H", req, 16 + struct.calcsize("P"))[0]
+        ssid = essid.tobytes()[:length].decode("utf-8", "replace") or None
+
+        frequency = None
+        frequency_mhz = None
+        req = _iwreq(interface)
+        try:
+            fcntl.ioctl(fd, _SIOCGIWFREQ, req)
+            mantissa, exponent = struct.unpack_from("ih", req, 16)
+            hz = mantissa * 10 ** exponent
+            # Small values are channel numbers rather than Hz
+            if hz >= 1000:
+                frequency = "%g" % round(hz / 1e9, 3)
+                frequency_mhz = round(hz / 1e6)
+        except OSError:
+            pass
+
+        bitrate = None
+        req = _iwreq(interface)
+        try:
+            fcntl.ioctl(fd, _SIOCGIWRATE, req)
+            value = struct.unpack_from("i", req, 16)[0]
+            if value > 0:
+                bitrate = round(value / 1e6, 1)
+        except OSError:
+            pass
+
     return {
-        "ssid": _get_ssid(),
-        "signal_dbm": _get_signal_strength(),
-        "frequency": _get_frequency(),
+        "ssid": ssid,
+        "frequency": frequency,
+        "frequency_mhz": frequency_mhz,
+        "bitrate_mbps": bitrate,
     }
 
 
+def _empty(interface: str) -> Dict[str, Any]:
+    return {
+        "interface": interface,
+        "ssid": None,
+        "signal_dbm": None,
+        "frequency": None,
+        "frequency_mhz": None,
+        "bitrate_mbps": None,
+        "link_quality": None,
+    }
+
+
+def _collect_commands(interface: str) -> Dict[str, Any]:
+    """Collect WiFi info by running the wireless tools (one iwconfig call)."""
+    parsed = _parse_iwconfig(_run_cmd(["iwconfig", interface]))
+    proc = _read_proc_wireless(interface) or {}
+    info = _empty(interface)
+    info["ssid"] = _get_ssid(interface)
+    info["signal_dbm"] = parsed["signal_dbm"] if parsed["signal_dbm"] is not None else proc.get("signal_dbm")
+    info["frequency"] = parsed["frequency"]
+    info["link_quality"] = proc.get("link_quality")
+    return info
+
+
+def _collect_direct(interface: str) -> Optional[Dict[str, Any]]:
+    """Collect WiFi info without forking: ioctls plus /proc/net/wireless."""
+    info = _ioctl_wireless(interface)
+    if info is None:
+        return None
+    proc = _read_proc_wireless(interface) or {}
+    info["interface"] = interface
+    info["signal_dbm"] = proc.get("signal_dbm")
+    info["link_quality"] = proc.get("link_quality")
+    return info
+
+
+def collect() -> Dict[str, Any]:
+    """Collect current WiFi information.
+
+    Reads everything in one pass from ioctls and /proc/net/wireless, only
+    falling back to the wireless command-line tools when that fails.
+    Results are cached for ``config.WIFI_CACHE_TTL`` seconds.
+    """
+    global _cache
+    interface = config.WIFI_INTERFACE
+    now = time.monotonic()
+    cached = _cache
+    if cached is not None and now - cached[0] < config.WIFI_CACHE_TTL:
+        return cached[1]
+
+    if not os.path.isdir(os.path.join(_SYS_NET, interface)):
+        info = _empty(interface)
+    else:
+        info = _collect_direct(interface)
+        if info is None:
+            info = _collect_commands(interface)
+    _cache = (now, info)
+    return info
+
+
+def _invalidate() -> None:
+    global _cache
+    _cache = None
+
+
 def change_wifi(ssid: str, password: str) -> Dict[str, Any]:
     """Change WiFi network via wpa_supplicant."""
     wpa_conf = '/etc/wpa_supplicant/wpa_supplicant.conf'
@@ -108,7 +249,8 @@ def change_wifi(ssid: str, password: str) -> Dict[str, Any]:
             f.write("\n")
 
         # Reconfigure wpa_supplicant
-        _run_cmd(["wpa_cli", "-i", "wlan0", "reconfigure"], timeout=10)
+        _run_cmd(["wpa_cli", "-i", config.WIFI_INTERFACE, "reconfigure"], timeout=10)
+        _invalidate()
 
         return {"success": True, "ssid": ssid}
     except PermissionError:
@@ -1,8 +1,156 @@
 from __future__ import annotations
 
 import os
+from typing import Dict
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.environ.get(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_intervals(name: str, defaults: Dict[str, float]) -> Dict[str, float]:
+    """Parse "key=seconds,key=seconds" overrides on top of ``defaults``."""
+    intervals = dict(defaults)
+    for item in os.environ.get(name, "").split(","):
+        key, sep, value = item.partition("=")
+        if sep:
+            intervals[key.strip()] = float(value)
+    return intervals
 
 
 PORT = int(os.environ.get("PIWATCH_PORT", "9100"))
 HOST = os.environ.get("PIWATCH_HOST", "0.0.0.0")
 TOKEN = os.environ.get("PIWATCH_TOKEN", "")
+
+# Seconds between background samples of the /metrics collectors
+SAMPLE_INTERVAL = float(os.environ.get("PIWATCH_SAMPLE_INTERVAL", "5"))
+
+# Per-collector refresh intervals. Disk usage and the container list change
+# far more slowly than load, so they are re-collected less often; override
+# with e.g. PIWATCH_REFRESH="cpu=1,disk=120". The cpu interval is the agent's
+# tick: history rows, pushed samples and stream frames follow it.
+REFRESH = _env_intervals("PIWATCH_REFRESH", {
+    "cpu": SAMPLE_INTERVAL,
+    "memory": SAMPLE_INTERVAL,
+    "temperature": SAMPLE_INTERVAL,
+    "network": SAMPLE_INTERVAL,
+    "processes": SAMPLE_INTERVAL,
+    "disk": max(SAMPLE_INTERVAL, 60.0),
+    "disk_io": SAMPLE_INTERVAL,
+    "pressure": SAMPLE_INTERVAL,
+    "docker": max(SAMPLE_INTERVAL, 30.0),
+})
+
+# Interfaces left out of the network section, as comma-separated shell
+# patterns, e.g. "lo,veth*,br-*" on container-heavy hosts
+NET_EXCLUDE = [p.strip() for p in os.environ.get("PIWATCH_NET_EXCLUDE", "").split(",") if p.strip()]
+
+# Seconds a `vcgencmd get_throttled` result is reused (only used when the
+# firmware's sysfs file is missing)
+THROTTLE_CACHE_TTL = float(os.environ.get("PIWATCH_THROTTLE_CACHE_TTL", "30"))
+
+# Seconds a `vcgencmd measure_temp` result is reused (only used when sysfs
+# has no temperature sensors)
+TEMP_VCGENCMD_TTL = float(os.environ.get("PIWATCH_TEMP_VCGENCMD_TTL", "30"))
+
+# Seconds a CPU frequency reading is reused between cpu samples
+CPU_FREQ_TTL = float(os.environ.get("PIWATCH_CPU_FREQ_TTL", "10"))
+
+# HTTP worker threads (0 = serve requests one at a time)
+WORKERS = int(os.environ.get("PIWATCH_WORKERS", "4"))
+
+# Seconds an idle keep-alive connection is held open
+KEEPALIVE_TIMEOUT = float(os.environ.get("PIWATCH_KEEPALIVE_TIMEOUT", "30"))
+
+# Samples kept in the in-memory history ring buffer (0 disables it). One
+# sample is taken per SAMPLE_INTERVAL and costs 72 + 4 * cores bytes, so the
+# default of 17280 holds 24h at 5s in about 1.5 MB on a 4-core Pi.
+HISTORY_SIZE = int(os.environ.get("PIWATCH_HISTORY_SIZE", "17280"))
+
+# On-disk time-series store for /metrics/range, off by default; set a writable
+# directory (e.g. /var/lib/piwatch/store) to enable it. Raw rows
+# (40 bytes per sample) are appended every STORE_FLUSH_SECONDS and rolled up
+# into hourly and daily min/avg/max; STORE_RETENTION sets the days each tier
+# is kept, e.g. PIWATCH_STORE_RETENTION="raw=3,daily=730".
+STORE_DIR = os.environ.get("PIWATCH_STORE_DIR", "")
+STORE_FLUSH_SECONDS = float(os.environ.get("PIWATCH_STORE_FLUSH_SECONDS", "60"))
+STORE_RETENTION = _env_intervals("PIWATCH_STORE_RETENTION", {"raw": 7, "hourly": 30, "daily": 365})
+
+# Alert rules evaluated against every sample, separated by semicolons:
+# "name: metric > threshold [for <seconds>] [clear <value>]". A rule fires
+# once the condition has held for the given time and resolves only when the
+# value crosses the clear level. Empty disables alerting. Metrics:
+# cpu_percent, load_1min, ram_percent, swap_percent, cpu_celsius,
+# disk_percent (fullest mount), disk_root_percent, psi_{cpu,memory,io}_some.
+ALERT_RULES = os.environ.get(
+    "PIWATCH_ALERT_RULES",
+    "high_cpu: cpu_percent > 90 for 120 clear 80;"
+    "high_temp: cpu_celsius > 70 for 30 clear 65;"
+    "high_memory: ram_percent > 90 for 60 clear 85;"
+    "low_disk: disk_percent > 90 clear 88",
+)
+# State changes kept for /alerts?since=
+ALERT_EVENTS = int(os.environ.get("PIWATCH_ALERT_EVENTS", "500"))
+
+# Docker Engine API socket; the docker CLI is only used when it's missing
+DOCKER_SOCKET = os.environ.get("PIWATCH_DOCKER_SOCKET", "/var/run/docker.sock")
+
+# Follow Docker /events so the container list is only re-fetched on change,
+# but never serve a cached list older than DOCKER_MAX_AGE seconds
+DOCKER_EVENTS = _env_bool("PIWATCH_DOCKER_EVENTS", "1")
+DOCKER_MAX_AGE = float(os.environ.get("PIWATCH_DOCKER_MAX_AGE", "60"))
+
+# Add per-container CPU/memory stats to the docker section (one API call each)
+DOCKER_STATS = _env_bool("PIWATCH_DOCKER_STATS", "0")
+
+# Max series per labelled family (cores, mounts, interfaces, processes,
+# containers) on /metrics/prom, to bound scraper label cardinality
+PROM_MAX_SERIES = int(os.environ.get("PIWATCH_PROM_MAX_SERIES", "32"))
+
+# Seconds before the cached hostname and default IP are re-read (route
+# changes reported over netlink also refresh them)
+HOSTFACTS_TTL = float(os.environ.get("PIWATCH_HOSTFACTS_TTL", "300"))
+
+# Wireless interface reported by /wifi and reconfigured by POST /wifi
+WIFI_INTERFACE = os.environ.get("PIWATCH_WIFI_INTERFACE", "wlan0")
+
+# Seconds a /wifi reading is reused
+WIFI_CACHE_TTL = float(os.environ.get("PIWATCH_WIFI_CACHE_TTL", "10"))
+
+# Push mode: POST gzipped batches of samples to this URL (empty = pull only)
+PUSH_URL = os.environ.get("PIWATCH_PUSH_URL", "")
+# Sent as X-Auth-Token; separate from TOKEN so the agent's own secret never
+# leaves the host unless it is set here explicitly
+PUSH_TOKEN = os.environ.get("PIWATCH_PUSH_TOKEN", "")
+PUSH_BATCH_SECONDS = float(os.environ.get("PIWATCH_PUSH_BATCH_SECONDS", "10"))
+
+# Batches that couldn't be sent wait here, oldest dropped past the size limit
+PUSH_SPOOL_DIR = os.environ.get("PIWATCH_PUSH_SPOOL_DIR", "/var/lib/piwatch/spool")
+PUSH_SPOOL_MAX_BYTES = int(os.environ.get("PIWATCH_PUSH_SPOOL_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Concurrent /metrics/stream viewers (each gets a thread on top of WORKERS, so
+# streams never take workers from regular requests) and the fastest pace a
+# viewer may ask for
+STREAM_MAX_CLIENTS = int(os.environ.get("PIWATCH_STREAM_MAX_CLIENTS", "2"))
+STREAM_MIN_INTERVAL = float(os.environ.get("PIWATCH_STREAM_MIN_INTERVAL", "1"))
+
+# gzip/deflate level for negotiated response compression (0 disables it) and
+# the smallest body worth compressing
+COMPRESS_LEVEL = int(os.environ.get("PIWATCH_COMPRESS_LEVEL", "6"))
+COMPRESS_MIN_BYTES = int(os.environ.get("PIWATCH_COMPRESS_MIN_BYTES", "256"))
+
+# Gateway mode: poll these peer agents ("host", "host:port", comma-separated)
+# and serve their combined snapshot on /fleet. Peers are polled every
+# GATEWAY_INTERVAL seconds, at most GATEWAY_CONCURRENCY at once, each given
+# GATEWAY_TIMEOUT seconds.
+PEERS = [p.strip() for p in os.environ.get("PIWATCH_PEERS", "").split(",") if p.strip()]
+GATEWAY_INTERVAL = float(os.environ.get("PIWATCH_GATEWAY_INTERVAL", str(SAMPLE_INTERVAL)))
+GATEWAY_CONCURRENCY = int(os.environ.get("PIWATCH_GATEWAY_CONCURRENCY", "16"))
+GATEWAY_TIMEOUT = float(os.environ.get("PIWATCH_GATEWAY_TIMEOUT", "3"))
+
+# UDP discovery: answer PIWATCH-DISCOVER probes sent by broadcast, to the
+# multicast group, or unicast on this port (python -m piwatch_agent.discovery).
+# Off by default: the responder listens on every interface, whatever HOST is.
+DISCOVERY = _env_bool("PIWATCH_DISCOVERY", "0")
+DISCOVERY_PORT = int(os.environ.get("PIWATCH_DISCOVERY_PORT", "9101"))
+DISCOVERY_GROUP = os.environ.get("PIWATCH_DISCOVERY_GROUP", "239.255.91.1")
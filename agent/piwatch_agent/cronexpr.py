@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Optional
+
+ALIASES = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+_MONTH_NAMES = {
+    name: i + 1
+    for i, name in enumerate(("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"))
+}
+_DOW_NAMES = {name: i for i, name in enumerate(("sun", "mon", "tue", "wed", "thu", "fri", "sat"))}
+
+# (low, high, names) per field; day-of-week accepts 7 as Sunday
+_FIELDS = (
+    (0, 59, {}),
+    (0, 23, {}),
+    (1, 31, {}),
+    (1, 12, _MONTH_NAMES),
+    (0, 7, _DOW_NAMES),
+)
+
+# Searches give up after this many years (covers Feb 29 across a skipped leap year)
+_SEARCH_YEARS = 9
+
+_MINUTE = timedelta(minutes=1)
+
+
+def _parse_value(text: str, names: Dict[str, int]) -> int:
+    lowered = text.lower()
+    if lowered in names:
+        return names[lowered]
+    return int(text)
+
+
+def _parse_field(text: str, low: int, high: int, names: Dict[str, int]) -> int:
+    """Parse one cron field into a bitset with bit ``n`` set for value ``n``."""
+    bits = 0
+    for part in text.split(","):
+        step = 1
+        has_step = "/" in part
+        if has_step:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError("step must be positive")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = _parse_value(start_text, names), _parse_value(end_text, names)
+        else:
+            start = _parse_value(part, names)
+            # "5/15" means every 15 starting at 5
+            end = high if has_step else start
+        if not low <= start <= end <= high:
+            raise ValueError("%r is out of range %d-%d" % (part, low, high))
+        for value in range(start, end + 1, step):
+            bits |= 1 << value
+    return bits
+
+
+class CronExpr:
+    """A compiled 5-field cron schedule.
+
+    Each field is an integer bitset, so matching a time is a handful of
+    shifts and finding the next minute within an hour is a single bit scan.
+    Day-of-month and day-of-week follow Vixie cron: when both are
+    restricted, a day matching either one fires.
+    """
+
+    __slots__ = ("minutes", "hours", "days", "months", "weekdays", "_day_or")
+
+    def __init__(self, expr: str) -> None:
+        expr = ALIASES.get(expr.strip().lower(), expr)
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError("expected 5 fields, got %d" % len(fields))
+        minutes, hours, days, months, weekdays = (
+            _parse_field(text, low, high, names)
+            for text, (low, high, names) in zip(fields, _FIELDS)
+        )
+        if weekdays & (1 << 7):
+            weekdays = (weekdays | 1) & ~(1 << 7)
+        self.minutes = minutes
+        self.hours = hours
+        self.days = days
+        self.months = months
+        self.weekdays = weekdays
+        self._day_or = not fields[2].startswith("*") and not fields[4].startswith("*")
+
+    def _day_matches(self, t: datetime) -> bool:
+        dom = bool(self.days >> t.day & 1)
+        # datetime.weekday() is Monday=0; cron is Sunday=0
+        dow = bool(self.weekdays >> ((t.weekday() + 1) % 7) & 1)
+        return dom or dow if self._day_or else dom and dow
+
+    def matches(self, t: datetime) -> bool:
+        """Whether the schedule fires in the minute containing ``t``."""
+        return (
+            bool(self.months >> t.month & 1)
+            and self._day_matches(t)
+            and bool(self.hours >> t.hour & 1)
+            and bool(self.minutes >> t.minute & 1)
+        )
+
+    def next_run(self, after: datetime) -> Optional[datetime]:
+        """Return the first firing time strictly after ``after``."""
+        t = after.replace(second=0, microsecond=0) + _MINUTE
+        limit = t.year + _SEARCH_YEARS
+        while t.year <= limit:
+            if not self.months >> t.month & 1:
+                year, month = (t.year + 1, 1) if t.month == 12 else (t.year, t.month + 1)
+                t = t.replace(year=year, month=month, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            hours = self.hours >> t.hour
+            if not hours:
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if not hours & 1:
+                t = t.replace(hour=t.hour + (hours & -hours).bit_length() - 1, minute=0)
+            minutes = self.minutes >> t.minute
+            if not minutes:
+                t = t.replace(minute=0) + timedelta(hours=1)
+                continue
+            return t.replace(minute=t.minute + (minutes & -minutes).bit_length() - 1)
+        return None
+
+    def prev_run(self, before: datetime) -> Optional[datetime]:
+        """Return the last firing time strictly before ``before``."""
+        t = before.replace(second=0, microsecond=0)
+        if t == before:
+            t -= _MINUTE
+        limit = t.year - _SEARCH_YEARS
+        while t.year >= limit:
+            if not self.months >> t.month & 1:
+                t = t.replace(day=1, hour=0, minute=0) - _MINUTE
+                continue
+            if not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) - _MINUTE
+                continue
+            hours = self.hours & ((2 << t.hour) - 1)
+            if not hours:
+                t = t.replace(hour=0, minute=0) - _MINUTE
+                continue
+            if not self.hours >> t.hour & 1:
+                t = t.replace(hour=hours.bit_length() - 1, minute=59)
+            minutes = self.minutes & ((2 << t.minute) - 1)
+            if not minutes:
+                t = t.replace(minute=0) - _MINUTE
+                continue
+            return t.replace(minute=minutes.bit_length() - 1)
+        return None
+
+
+@lru_cache(maxsize=1024)
+def parse(expr: str) -> CronExpr:
+    """Compile a cron schedule, reusing previously compiled ones.
+
+    Raises ValueError for malformed expressions and for ``@reboot``, which
+    has no time-based schedule.
+    """
+    return CronExpr(expr)
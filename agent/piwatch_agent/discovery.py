@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import argparse
+import ipaddress
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from piwatch_agent import __version__
+from piwatch_agent import config
+from piwatch_agent import hostinfo
+from piwatch_agent.collectors import system
+from piwatch_agent.sampler import safe_collect
+
+logger = logging.getLogger("piwatch")
+
+# Probe datagram: the magic, optionally followed by a space and a nonce the
+# reply echoes so a client can ignore stale answers to an earlier probe.
+PROBE_MAGIC = b"PIWATCH-DISCOVER/1"
+
+
+def payload() -> Dict[str, Any]:
+    """Build the discovery payload shared by HTTP /discover and UDP replies."""
+    sys_info = safe_collect(system.collect) or {}
+    return {
+        "service": "piwatch-agent",
+        "version": __version__,
+        "hostname": hostinfo.facts.hostname(),
+        "ip_address": hostinfo.default_ip(),
+        "port": config.PORT,
+        "model": sys_info.get("model"),
+        "os": sys_info.get("os_name"),
+        "architecture": sys_info.get("architecture"),
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+
+
+def _parse_probe(data: bytes) -> Optional[str]:
+    """Return the probe's nonce ("" if none), or None if it isn't a probe."""
+    if not data.startswith(PROBE_MAGIC):
+        return None
+    rest = data[len(PROBE_MAGIC):]
+    if rest and not rest.startswith(b" "):
+        return None
+    return rest[1:65].decode("ascii", "replace")
+
+
+class DiscoveryResponder:
+    """Answer UDP discovery probes (broadcast, multicast or unicast).
+
+    Replies go straight back to the prober. Only probes from private,
+    loopback or link-local addresses are answered, so the agent can't be
+    used to reflect traffic at hosts on the internet.
+    """
+
+    def __init__(self, port: int, group: str = "") -> None:
+        self._port = port
+        self._group = group
+        self._sock: Optional[socket.socket] = None
+
+    def start(self) -> bool:
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(("", self._port))
+        except OSError as e:
+            logger.warning("UDP discovery disabled, can't bind port %d: %s", self._port, e)
+            return False
+        if self._group:
+            try:
+                mreq = struct.pack("4s4s", socket.inet_aton(self._group), socket.inet_aton("0.0.0.0"))
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+            except OSError as e:
+                logger.warning("UDP discovery: can't join multicast group %s: %s", self._group, e)
+        self._sock = sock
+        threading.Thread(target=self._loop, name="discovery", daemon=True).start()
+        return True
+
+    def stop(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _loop(self) -> None:
+        sock = self._sock
+        while True:
+            try:
+                data, addr = sock.recvfrom(512)
+            except OSError:
+                # Socket closed by stop()
+                return
+            nonce = _parse_probe(data)
+            if nonce is None:
+                continue
+            try:
+                source = ipaddress.ip_address(addr[0])
+            except ValueError:
+                continue
+            if not (source.is_private or source.is_loopback or source.is_link_local):
+                continue
+            reply = payload()
+            reply["nonce"] = nonce
+            try:
+                sock.sendto(json.dumps(reply, separators=(",", ":")).encode("utf-8"), addr)
+            except OSError as e:
+                logger.debug("UDP discovery reply to %s failed: %s", addr[0], e)
+
+
+def discover(
+    timeout: float = 1.0,
+    port: int = config.DISCOVERY_PORT,
+    targets: Iterable[str] = ("255.255.255.255",),
+) -> List[Dict[str, Any]]:
+    """Send one probe to each target and collect replies until ``timeout``.
+
+    Targets can be broadcast addresses, the multicast group or single
+    hosts. Each reply is the agent's /discover payload plus the address it
+    came from in ``source_address``; duplicates (an agent reached through
+    several targets) are dropped.
+    """
+    nonce = os.urandom(8).hex()
+    probe = PROBE_MAGIC + b" " + nonce.encode("ascii")
+    found: Dict[str, Dict[str, Any]] = {}
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        for target in targets:
+            try:
+                sock.sendto(probe, (target, port))
+            except OSError as e:
+                logger.debug("Discovery probe to %s failed: %s", target, e)
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            sock.settimeout(remaining)
+            try:
+                data, addr = sock.recvfrom(4096)
+            except socket.timeout:
+                break
+            except OSError:
+                continue
+            try:
+                reply = json.loads(data)
+            except ValueError:
+                continue
+            if not isinstance(reply, dict) or reply.get("nonce") != nonce:
+                continue
+            reply.pop("nonce")
+            reply["source_address"] = addr[0]
+            key = "%s|%s|%s" % (reply.get("hostname"), reply.get("ip_address"), reply.get("port"))
+            found.setdefault(key, reply)
+    return list(found.values())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Find PiWatch agents on the local network.")
+    parser.add_argument("--timeout", type=float, default=1.0, help="seconds to wait for replies")
+    parser.add_argument("--port", type=int, default=config.DISCOVERY_PORT)
+    parser.add_argument("targets", nargs="*", help="broadcast, multicast or host addresses to probe "
+                        "(default: 255.255.255.255 and the discovery multicast group)")
+    args = parser.parse_args()
+    targets = args.targets or ["255.255.255.255"] + ([config.DISCOVERY_GROUP] if config.DISCOVERY_GROUP else [])
+    for agent in discover(args.timeout, args.port, targets):
+        print(json.dumps(agent))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import struct
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+_MSGPACK_TYPES = (MSGPACK_CONTENT_TYPE, "application/x-msgpack")
+
+# Content-Encoding name -> zlib wbits (gzip framing, zlib framing as HTTP "deflate")
+_WBITS = {"gzip": 31, "deflate": 15}
+
+
+def _accepted(header: str) -> Dict[str, float]:
+    """Parse an Accept / Accept-Encoding header into {token: q}."""
+    accepted: Dict[str, float] = {}
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[token] = q
+    return accepted
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick "gzip" or "deflate" from an Accept-Encoding header, or None."""
+    if not accept_encoding:
+        return None
+    accepted = _accepted(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in _WBITS:
+        q = accepted.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """True when the client prefers MessagePack over JSON."""
+    if not accept:
+        return False
+    accepted = _accepted(accept)
+    packed = max(accepted.get(t, 0.0) for t in _MSGPACK_TYPES)
+    return packed > 0 and packed >= accepted.get("application/json", 0.0)
+
+
+def compress(body: Any, encoding: str, level: int = 6) -> bytes:
+    """Compress a bytes-like body with the named Content-Encoding."""
+    c = zlib.compressobj(level, zlib.DEFLATED, _WBITS[encoding])
+    return c.compress(body) + c.flush()
+
+
+# --- MessagePack -----------------------------------------------------------
+
+_pack_float = struct.Struct(">Bd").pack
+_pack_b = struct.Struct(">BB").pack
+_pack_h = struct.Struct(">BH").pack
+_pack_i = struct.Struct(">BI").pack
+_pack_q = struct.Struct(">BQ").pack
+_pack_sb = struct.Struct(">Bb").pack
+_pack_sh = struct.Struct(">Bh").pack
+_pack_si = struct.Struct(">Bi").pack
+_pack_sq = struct.Struct(">Bq").pack
+
+
+def _pack_int(out: bytearray, v: int) -> None:
+    if 0 <= v < 0x80:
+        out.append(v)
+    elif -32 <= v < 0:
+        out.append(v & 0xFF)
+    elif v >= 0:
+        if v <= 0xFF:
+            out += _pack_b(0xCC, v)
+        elif v <= 0xFFFF:
+            out += _pack_h(0xCD, v)
+        elif v <= 0xFFFFFFFF:
+            out += _pack_i(0xCE, v)
+        elif v <= 0xFFFFFFFFFFFFFFFF:
+            out += _pack_q(0xCF, v)
+        else:
+            raise OverflowError("int too large for MessagePack")
+    elif v >= -0x80:
+        out += _pack_sb(0xD0, v)
+    elif v >= -0x8000:
+        out += _pack_sh(0xD1, v)
+    elif v >= -0x80000000:
+        out += _pack_si(0xD2, v)
+    elif v >= -0x8000000000000000:
+        out += _pack_sq(0xD3, v)
+    else:
+        raise OverflowError("int too large for MessagePack")
+
+
+def _pack_header(out: bytearray, n: int, fix: int, fix_max: int, op8: Optional[int], op16: int) -> None:
+    if n <= fix_max:
+        out.append(fix | n)
+    elif op8 is not None and n <= 0xFF:
+        out += _pack_b(op8, n)
+    elif n <= 0xFFFF:
+        out += _pack_h(op16, n)
+    else:
+        out += _pack_i(op16 + 1, n)
+
+
+def _pack(out: bytearray, obj: Any) -> None:
+    t = type(obj)
+    if t is str:
+        data = obj.encode("utf-8")
+        _pack_header(out, len(data), 0xA0, 31, 0xD9, 0xDA)
+        out += data
+    elif obj is None:
+        out.append(0xC0)
+    elif t is bool:
+        out.append(0xC3 if obj else 0xC2)
+    elif t is int:
+        _pack_int(out, obj)
+    elif t is float:
+        out += _pack_float(0xCB, obj)
+    elif t is dict:
+        _pack_header(out, len(obj), 0x80, 15, None, 0xDE)
+        for key, value in obj.items():
+            _pack(out, key)
+            _pack(out, value)
+    elif t is list or t is tuple:
+        _pack_header(out, len(obj), 0x90, 15, None, 0xDC)
+        for value in obj:
+            _pack(out, value)
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        data = bytes(obj)
+        _pack_header(out, len(data), 0, -1, 0xC4, 0xC5)
+        out += data
+    elif isinstance(obj, (int, float, str, dict, list, tuple)):
+        # Subclasses (IntEnum, namedtuple, ...) pack as their base type
+        base = next(b for b in (bool, int, float, str, dict, list, tuple) if isinstance(obj, b))
+        _pack(out, base(obj))
+    else:
+        raise TypeError("Object of type %s is not MessagePack serializable" % t.__name__)
+
+
+def msgpack_dumps(obj: Any) -> bytes:
+    """Encode JSON-compatible data (plus bytes) as MessagePack."""
+    out = bytearray()
+    _pack(out, obj)
+    return bytes(out)
+
+
+class _Unpacker:
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.pos = 0
+
+    def _take(self, n: int) -> bytes:
+        end = self.pos + n
+        if end > len(self.data):
+            raise ValueError("truncated MessagePack data")
+        chunk = self.data[self.pos:end]
+        self.pos = end
+        return chunk
+
+    def _unpack(self, fmt: str) -> Any:
+        size = struct.calcsize(fmt)
+        return struct.unpack(fmt, self._take(size))[0]
+
+    def _array(self, n: int) -> List[Any]:
+        return [self.read() for _ in range(n)]
+
+    def _map(self, n: int) -> Dict[Any, Any]:
+        result = {}
+        for _ in range(n):
+            key = self.read()
+            result[key] = self.read()
+        return result
+
+    def read(self) -> Any:
+        b = self._take(1)[0]
+        if b < 0x80:
+            return b
+        if b >= 0xE0:
+            return b - 0x100
+        if b <= 0x8F:
+            return self._map(b & 0x0F)
+        if b <= 0x9F:
+            return self._array(b & 0x0F)
+        if b <= 0xBF:
+            return self._take(b & 0x1F).decode("utf-8")
+        handler = _HANDLERS.get(b)
+        if handler is None:
+            raise ValueError("unsupported MessagePack type 0x%02x" % b)
+        return handler(self)
+
+
+_HANDLERS: Dict[int, Callable[[_Unpacker], Any]] = {
+    0xC0: lambda u: None,
+    0xC2: lambda u: False,
+    0xC3: lambda u: True,
+    0xC4: lambda u: u._take(u._unpack(">B")),
+    0xC5: lambda u: u._take(u._unpack(">H")),
+    0xC6: lambda u: u._take(u._unpack(">I")),
+    0xCA: lambda u: u._unpack(">f"),
+    0xCB: lambda u: u._unpack(">d"),
+    0xCC: lambda u: u._unpack(">B"),
+    0xCD: lambda u: u._unpack(">H"),
+    0xCE: lambda u: u._unpack(">I"),
+    0xCF: lambda u: u._unpack(">Q"),
+    0xD0: lambda u: u._unpack(">b"),
+    0xD1: lambda u: u._unpack(">h"),
+    0xD2: lambda u: u._unpack(">i"),
+    0xD3: lambda u: u._unpack(">q"),
+    0xD9: lambda u: u._take(u._unpack(">B")).decode("utf-8"),
+    0xDA: lambda u: u._take(u._unpack(">H")).decode("utf-8"),
+    0xDB: lambda u: u._take(u._unpack(">I")).decode("utf-8"),
+    0xDC: lambda u: u._array(u._unpack(">H")),
+    0xDD: lambda u: u._array(u._unpack(">I")),
+    0xDE: lambda u: u._map(u._unpack(">H")),
+    0xDF: lambda u: u._map(u._unpack(">I")),
+}
+
+
+def msgpack_loads(data: bytes) -> Any:
+    """Decode a single MessagePack object (no extension types)."""
+    unpacker = _Unpacker(bytes(data))
+    obj = unpacker.read()
+    if unpacker.pos != len(unpacker.data):
+        raise ValueError("extra data after MessagePack object")
+    return obj
+
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from piwatch_agent import __version__
+
+logger = logging.getLogger("piwatch")
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def parse_peer(peer: str, default_port: int) -> Tuple[str, int]:
+    """Split "host", "host:port" or "[v6addr]:port" into (host, port)."""
+    if peer.startswith("["):
+        host, _, rest = peer[1:].partition("]")
+        return host, int(rest[1:]) if rest.startswith(":") else default_port
+    if peer.count(":") == 1:
+        host, _, port = peer.partition(":")
+        return host, int(port)
+    return peer, default_port
+
+
+class _PeerError(Exception):
+    pass
+
+
+def _json_object(body: bytes, path: str) -> Dict[str, Any]:
+    data = json.loads(body)
+    if not isinstance(data, dict):
+        raise _PeerError("%s returned %s, not an object" % (path, type(data).__name__))
+    return data
+
+
+class _PeerState:
+    """What the gateway knows about one peer between polls."""
+
+    def __init__(self, address: str, host: str, port: int) -> None:
+        self.address = address
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.cursor: Optional[str] = None
+        self.health: Optional[Dict[str, Any]] = None
+        self.metrics: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.timed_out = False
+        self.latency: Optional[float] = None
+        self.last_success: Optional[float] = None
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+        # A new connection may reach a restarted agent; start from a full snapshot
+        self.cursor = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ok": self.error is None,
+            "timed_out": self.timed_out,
+            "error": self.error,
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+            "last_success": None if self.last_success is None else _iso(self.last_success),
+            "stale": self.error is not None and self.metrics is not None,
+            "health": self.health,
+            "metrics": self.metrics,
+        }
+
+
+class Gateway:
+    """Poll peer agents concurrently and keep a merged fleet snapshot.
+
+    A background thread runs an asyncio loop that, every ``interval``
+    seconds, fetches ``/health`` and ``/metrics`` from every peer with at
+    most ``concurrency`` peers in flight. Each peer gets ``timeout`` seconds
+    for both requests. Connections are kept alive between polls and
+    ``/metrics`` is requested as a delta from the previous cursor, so a
+    steady-state poll costs each peer very little. Peers that fail keep
+    their last good data, marked stale.
+    """
+
+    def __init__(
+        self,
+        peers: List[str],
+        default_port: int,
+        interval: float = 5.0,
+        concurrency: int = 16,
+        timeout: float = 3.0,
+    ) -> None:
+        self._peers = []
+        for address in peers:
+            host, port = parse_peer(address, default_port)
+            self._peers.append(_PeerState(address, host, port))
+        self._interval = interval
+        self._concurrency = max(concurrency, 1)
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._snapshot: Dict[str, Any] = self._build(None)
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, name="gateway", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the latest fleet snapshot."""
+        with self._lock:
+            return self._snapshot
+
+    def _run(self) -> None:
+        asyncio.run(self._main())
+
+    async def _main(self) -> None:
+        semaphore = asyncio.Semaphore(self._concurrency)
+        while not self._stop.is_set():
+            started = time.monotonic()
+            await asyncio.gather(*(self._poll(peer, semaphore) for peer in self._peers))
+            snapshot = self._build(time.time())
+            with self._lock:
+                self._snapshot = snapshot
+            await asyncio.sleep(max(self._interval - (time.monotonic() - started), 0.0))
+        for peer in self._peers:
+            peer.close()
+
+    async def _poll(self, peer: _PeerState, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            started = time.monotonic()
+            was_ok = peer.error is None
+            try:
+                await asyncio.wait_for(self._fetch(peer), self._timeout)
+            except asyncio.TimeoutError:
+                peer.close()
+                peer.error = "timed out after %.1fs" % self._timeout
+                peer.timed_out = True
+            except (OSError, ValueError, _PeerError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+                peer.close()
+                peer.error = str(e) or type(e).__name__
+                peer.timed_out = False
+            except Exception as e:
+                # Whatever one peer sends must not end polling for the site
+                logger.debug("Gateway: unexpected error polling %s", peer.address, exc_info=True)
+                peer.close()
+                peer.error = "%s: %s" % (type(e).__name__, e)
+                peer.timed_out = False
+            else:
+                peer.error = None
+                peer.timed_out = False
+                peer.latency = time.monotonic() - started
+                peer.last_success = time.time()
+                if not was_ok:
+                    logger.info("Gateway: peer %s is back", peer.address)
+                return
+            if was_ok:
+                logger.warning("Gateway: peer %s failed: %s", peer.address, peer.error)
+
+    async def _fetch(self, peer: _PeerState) -> None:
+        reused = peer.writer is not None
+        try:
+            await self._exchange(peer)
+        except (OSError, asyncio.IncompleteReadError):
+            # The peer may have closed the idle kept-alive connection; retry fresh
+            if not reused:
+                raise
+            peer.close()
+            await self._exchange(peer)
+
+    async def _exchange(self, peer: _PeerState) -> None:
+        status, body = await self._get(peer, "/health")
+        if status != 200:
+            raise _PeerError("/health returned HTTP %d" % status)
+        peer.health = _json_object(body, "/health")
+
+        path = "/metrics" if peer.cursor is None else "/metrics?since=" + peer.cursor
+        status, body = await self._get(peer, path)
+        if status == 304:
+            return
+        if status != 200:
+            raise _PeerError("/metrics returned HTTP %d" % status)
+        data = _json_object(body, "/metrics")
+        if data.get("delta") and peer.metrics is not None:
+            # Build a new dict: published snapshots may still be serializing the old one
+            merged = dict(peer.metrics)
+            merged.update(data)
+            merged["delta"] = False
+            peer.metrics = merged
+        else:
+            peer.metrics = data
+        peer.cursor = data.get("cursor")
+
+    async def _get(self, peer: _PeerState, path: str) -> Tuple[int, bytes]:
+        """Send one GET on the peer's kept-alive connection; return (status, body)."""
+        if peer.reader is None or peer.writer is None:
+            peer.reader, peer.writer = await asyncio.open_connection(peer.host, peer.port)
+        peer.writer.write((
+            "GET %s HTTP/1.1\r\nHost: %s:%d\r\nAccept-Encoding: gzip\r\n"
+            "User-Agent: piwatch-gateway/%s\r\n\r\n" % (path, peer.host, peer.port, __version__)
+        ).encode("ascii"))
+        await peer.writer.drain()
+
+        head = await peer.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("iso-8859-1").split("\r\n")
+        parts = lines[0].split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise _PeerError("malformed response from %s" % peer.address)
+        status = int(parts[1])
+        headers = {}
+        for line in lines[1:]:
+            key, sep, value = line.partition(":")
+            if sep:
+                headers[key.strip().lower()] = value.strip()
+
+        if "content-length" in headers:
+            body = await peer.reader.readexactly(int(headers["content-length"]))
+        elif status == 304 or status < 200:
+            body = b""
+        else:
+            body = await peer.reader.read()
+            headers["connection"] = "close"
+        if headers.get("connection", "").lower() == "close":
+            peer.writer.close()
+            peer.reader = peer.writer = None
+        if headers.get("content-encoding") == "gzip":
+            try:
+                body = gzip.decompress(body)
+            except (OSError, EOFError, zlib.error) as e:
+                raise _PeerError("corrupt gzip body from %s: %s" % (peer.address, e))
+        return status, body
+
+    def _build(self, polled_at: Optional[float]) -> Dict[str, Any]:
+        peers = {peer.address: peer.to_dict() for peer in self._peers}
+        return {
+            "polled_at": None if polled_at is None else _iso(polled_at),
+            "interval_seconds": self._interval,
+            "peer_count": len(peers),
+            "ok_count": sum(1 for p in peers.values() if p["ok"] and p["health"] is not None),
+            "timed_out": [address for address, p in peers.items() if p["timed_out"]],
+            "failed": [address for address, p in peers.items() if not p["ok"] and not p["timed_out"]],
+            "peers": peers,
+        }
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import math
+import threading
+from array import array
+from typing import Any, Dict, List, Optional
+
+# Series stored as 32-bit floats (percentages, temperatures, load) unless
+# listed here; cumulative byte counters need doubles to stay exact.
+_DOUBLE_SERIES = ("net_bytes_sent", "net_bytes_recv")
+
+
+def _series_names(core_count: int) -> List[str]:
+    names = ["cpu_percent"]
+    names.extend("cpu_core%d_percent" % i for i in range(core_count))
+    names.extend([
+        "load_1min",
+        "ram_percent",
+        "swap_percent",
+        "cpu_celsius",
+        "disk_root_percent",
+        "net_bytes_sent",
+        "net_bytes_recv",
+        "psi_cpu_some",
+        "psi_memory_some",
+        "psi_memory_full",
+        "psi_io_some",
+        "psi_io_full",
+        "throttled_flags",
+    ])
+    return names
+
+
+def _extract(snapshot: Dict[str, Any], core_count: int) -> Dict[str, Optional[float]]:
+    """Pull the numeric history series out of a sampler snapshot."""
+    values: Dict[str, Optional[float]] = {}
+
+    cpu = snapshot.get("cpu") or {}
+    values["cpu_percent"] = cpu.get("usage_percent")
+    per_core = cpu.get("per_core_percent") or []
+    for i in range(core_count):
+        values["cpu_core%d_percent" % i] = per_core[i] if i < len(per_core) else None
+    values["load_1min"] = (cpu.get("load_avg") or {}).get("1min")
+
+    memory = snapshot.get("memory") or {}
+    values["ram_percent"] = (memory.get("ram") or {}).get("percent")
+    values["swap_percent"] = (memory.get("swap") or {}).get("percent")
+
+    values["cpu_celsius"] = (snapshot.get("temperature") or {}).get("cpu_celsius")
+
+    disks = snapshot.get("disk") or []
+    root = next((d for d in disks if d.get("mountpoint") == "/"), disks[0] if disks else None)
+    values["disk_root_percent"] = root.get("percent") if root else None
+
+    interfaces = (snapshot.get("network") or {}).get("interfaces")
+    if interfaces:
+        values["net_bytes_sent"] = float(sum(i.get("bytes_sent", 0) for i in interfaces.values()))
+        values["net_bytes_recv"] = float(sum(i.get("bytes_recv", 0) for i in interfaces.values()))
+
+    # 10s PSI averages; the raw throttling bitmask fits a float exactly
+    pressure = snapshot.get("pressure") or {}
+    for resource, kind in (("cpu", "some"), ("memory", "some"), ("memory", "full"), ("io", "some"), ("io", "full")):
+        values["psi_%s_%s" % (resource, kind)] = ((pressure.get(resource) or {}).get(kind) or {}).get("avg10")
+    throttling = pressure.get("throttling")
+    if throttling:
+        values["throttled_flags"] = float(int(throttling["raw"], 16))
+
+    return values
+
+
+class History:
+    """Fixed-size ring buffer of numeric metric samples.
+
+    Every series is a preallocated ``array`` of ``capacity`` slots, so memory
+    use is fixed at startup no matter how long the agent runs. Missing
+    values are stored as NaN and returned as null.
+    """
+
+    def __init__(self, capacity: int, core_count: int) -> None:
+        self.capacity = max(capacity, 1)
+        self._core_count = core_count
+        self._names = _series_names(core_count)
+        self._times = array("d", [0.0]) * self.capacity
+        self._series = {
+            name: array("d" if name in _DOUBLE_SERIES else "f", [math.nan]) * self.capacity
+            for name in self._names
+        }
+        self._head = 0  # next slot to write
+        self._count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the ring buffer arrays."""
+        total = self._times.itemsize * len(self._times)
+        for series in self._series.values():
+            total += series.itemsize * len(series)
+        return total
+
+    def record(self, timestamp: float, snapshot: Dict[str, Any]) -> None:
+        """Append one sample extracted from a sampler snapshot."""
+        values = _extract(snapshot, self._core_count)
+        with self._lock:
+            slot = self._head
+            self._times[slot] = timestamp
+            for name, series in self._series.items():
+                value = values.get(name)
+                series[slot] = math.nan if value is None else value
+            self._head = (slot + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def _slot(self, index: int) -> int:
+        """Map a logical index (0 = oldest) to a buffer slot."""
+        return (self._head - self._count + index) % self.capacity
+
+    def since(self, timestamp: float = 0.0) -> Dict[str, Any]:
+        """Return all samples newer than ``timestamp`` as columnar lists."""
+        with self._lock:
+            # Timestamps are appended in order, so binary search the live range
+            lo, hi = 0, self._count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._times[self._slot(mid)] <= timestamp:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            slots = [self._slot(i) for i in range(lo, self._count)]
+            times = [round(self._times[s], 3) for s in slots]
+            series = {}
+            for name, values in self._series.items():
+                column = []
+                for s in slots:
+                    v = values[s]
+                    column.append(None if math.isnan(v) else round(v, 2))
+                series[name] = column
+
+        return {
+            "capacity": self.capacity,
+            "count": len(times),
+            "timestamps": times,
+            "series": series,
+        }
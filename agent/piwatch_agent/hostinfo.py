@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import logging
+import platform
+import socket
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import psutil
+
+from piwatch_agent import __version__
+from piwatch_agent import config
+
+logger = logging.getLogger("piwatch")
+
+# rtnetlink multicast groups: link up/down, IPv4/IPv6 address and route changes
+_RTMGRP_LINK = 0x1
+_RTMGRP_IPV4_IFADDR = 0x10
+_RTMGRP_IPV4_ROUTE = 0x40
+_RTMGRP_IPV6_IFADDR = 0x100
+
+_MODEL_PATH = "/proc/device-tree/model"
+
+
+def _read_pi_model() -> Optional[str]:
+    """Read Raspberry Pi model from device tree."""
+    try:
+        with open(_MODEL_PATH, "r") as f:
+            return f.read().strip().rstrip("\x00")
+    except (FileNotFoundError, PermissionError):
+        return None
+
+
+def _probe_default_ip() -> str:
+    """Get the default outgoing IP address."""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(("8.8.8.8", 80))
+            return s.getsockname()[0]
+    except OSError:
+        return "127.0.0.1"
+
+
+class HostFacts:
+    """Cache of host facts that rarely or never change.
+
+    Model, OS, architecture and boot time are read once. Hostname and the
+    default IP are refreshed after ``ttl`` seconds, or immediately when a
+    netlink route/address change is seen (Linux only).
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._static: Optional[Dict[str, Any]] = None
+        self._boot_time: Optional[float] = None
+        self._hostname: Optional[str] = None
+        self._ip: Optional[str] = None
+        self._refreshed_at = 0.0
+        self._watcher: Optional[threading.Thread] = None
+
+    def static(self) -> Dict[str, Any]:
+        """Return facts that don't change while the agent runs."""
+        if self._static is None:
+            self._static = {
+                "model": _read_pi_model(),
+                "os_name": platform.system(),
+                "os_version": platform.version(),
+                "os_release": platform.release(),
+                "kernel": platform.release(),
+                "architecture": platform.machine(),
+                "python_version": platform.python_version(),
+                "agent_version": __version__,
+            }
+        return self._static
+
+    def uptime_seconds(self) -> int:
+        if self._boot_time is None:
+            self._boot_time = psutil.boot_time()
+        return int(time.time() - self._boot_time)
+
+    def _refresh(self) -> None:
+        with self._lock:
+            if self._ip is not None and time.monotonic() - self._refreshed_at < self.ttl:
+                return
+            self._hostname = socket.gethostname()
+            self._ip = _probe_default_ip()
+            self._refreshed_at = time.monotonic()
+
+    def hostname(self) -> str:
+        self._refresh()
+        return self._hostname or socket.gethostname()
+
+    def default_ip(self) -> str:
+        self._refresh()
+        return self._ip or "127.0.0.1"
+
+    def invalidate(self) -> None:
+        """Force hostname and IP to be re-read on next access."""
+        with self._lock:
+            self._ip = None
+
+    def watch_routes(self) -> bool:
+        """Invalidate the IP whenever the kernel reports a route/address change.
+
+        Returns False when netlink isn't available on this platform.
+        """
+        if self._watcher is not None:
+            return True
+        if not hasattr(socket, "AF_NETLINK"):
+            return False
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, getattr(socket, "NETLINK_ROUTE", 0))
+            sock.bind((0, _RTMGRP_LINK | _RTMGRP_IPV4_IFADDR | _RTMGRP_IPV4_ROUTE | _RTMGRP_IPV6_IFADDR))
+        except OSError as e:
+            logger.debug("Netlink route watch unavailable: %s", e)
+            return False
+        self._watcher = threading.Thread(target=self._watch_loop, args=(sock,), name="hostinfo-netlink", daemon=True)
+        self._watcher.start()
+        return True
+
+    def _watch_loop(self, sock: socket.socket) -> None:
+        with sock:
+            while True:
+                try:
+                    sock.recv(65536)
+                except OSError as e:
+                    logger.debug("Netlink route watch stopped: %s", e)
+                    self._watcher = None
+                    return
+                self.invalidate()
+
+
+facts = HostFacts(config.HOSTFACTS_TTL)
+
+
+def default_ip() -> str:
+    """Return the cached default outgoing IP address."""
+    return facts.default_ip()
@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from piwatch_agent import __version__
+from piwatch_agent.stats import BUCKETS
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Buffer size for the next render; grows to the largest payload seen so a
+# steady-state scrape writes into one allocation.
+_size_hint = 8192
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class MetricWriter:
+    """Write OpenMetrics text into a preallocated bytearray.
+
+    Lines are copied into the buffer at a running offset instead of being
+    built up by string concatenation; ``getvalue()`` returns a memoryview
+    over the written bytes so the response can be sent without a copy.
+    """
+
+    __slots__ = ("_buf", "_pos")
+
+    def __init__(self, capacity: int = 8192) -> None:
+        self._buf = bytearray(capacity)
+        self._pos = 0
+
+    def _write(self, text: str) -> None:
+        data = text.encode("utf-8")
+        end = self._pos + len(data)
+        if end > len(self._buf):
+            self._buf.extend(bytes(max(len(self._buf), end - len(self._buf))))
+        self._buf[self._pos:end] = data
+        self._pos = end
+
+    def family(self, name: str, metric_type: str, help_text: str, unit: Optional[str] = None) -> None:
+        self._write("# TYPE %s %s\n" % (name, metric_type))
+        if unit:
+            self._write("# UNIT %s %s\n" % (name, unit))
+        self._write("# HELP %s %s\n" % (name, help_text))
+
+    def sample(self, name: str, value: Any, labels: Optional[Iterable[Tuple[str, Any]]] = None) -> None:
+        if value is None:
+            return
+        if labels:
+            label_text = ",".join('%s="%s"' % (k, _escape(str(v))) for k, v in labels)
+            self._write("%s{%s} %s\n" % (name, label_text, _format_value(value)))
+        else:
+            self._write("%s %s\n" % (name, _format_value(value)))
+
+    def eof(self) -> None:
+        self._write("# EOF\n")
+
+    def getvalue(self) -> memoryview:
+        return memoryview(self._buf)[:self._pos]
+
+
+def _gauge(w: MetricWriter, name: str, help_text: str, value: Any, unit: Optional[str] = None) -> None:
+    if value is None:
+        return
+    w.family(name, "gauge", help_text, unit)
+    w.sample(name, value)
+
+
+def _labelled(
+    w: MetricWriter,
+    name: str,
+    metric_type: str,
+    help_text: str,
+    rows: List[Tuple[List[Tuple[str, Any]], Any]],
+    unit: Optional[str] = None,
+) -> None:
+    """Write one family with a labelled sample per row."""
+    if not rows:
+        return
+    w.family(name, metric_type, help_text, unit)
+    sample_name = name + "_total" if metric_type == "counter" else name
+    for labels, value in rows:
+        w.sample(sample_name, value, labels)
+
+
+def _render_cpu(w: MetricWriter, cpu: Dict[str, Any], max_series: int) -> None:
+    _gauge(w, "piwatch_cpu_usage_percent", "Total CPU usage.", cpu.get("usage_percent"))
+    per_core = (cpu.get("per_core_percent") or [])[:max_series]
+    _labelled(w, "piwatch_cpu_core_usage_percent", "gauge", "Per-core CPU usage.",
+              [([("core", i)], v) for i, v in enumerate(per_core)])
+    _gauge(w, "piwatch_cpu_cores", "Logical CPU count.", cpu.get("core_count"))
+    freq = cpu.get("frequency") or {}
+    _gauge(w, "piwatch_cpu_frequency_mhz", "Current CPU frequency.", freq.get("current_mhz"))
+    load = cpu.get("load_avg") or {}
+    _labelled(w, "piwatch_load_average", "gauge", "System load average.",
+              [([("period", period)], load[period]) for period in ("1min", "5min", "15min") if period in load])
+
+
+def _render_memory(w: MetricWriter, memory: Dict[str, Any]) -> None:
+    ram = memory.get("ram") or {}
+    swap = memory.get("swap") or {}
+    _gauge(w, "piwatch_memory_total_bytes", "Total RAM.", ram.get("total_bytes"), "bytes")
+    _gauge(w, "piwatch_memory_used_bytes", "Used RAM.", ram.get("used_bytes"), "bytes")
+    _gauge(w, "piwatch_memory_available_bytes", "Available RAM.", ram.get("available_bytes"), "bytes")
+    _gauge(w, "piwatch_swap_total_bytes", "Total swap.", swap.get("total_bytes"), "bytes")
+    _gauge(w, "piwatch_swap_used_bytes", "Used swap.", swap.get("used_bytes"), "bytes")
+
+
+def _render_disk(w: MetricWriter, disks: List[Dict[str, Any]], max_series: int) -> None:
+    disks = disks[:max_series]
+
+    def rows(key: str) -> List[Tuple[List[Tuple[str, Any]], Any]]:
+        return [
+            ([("mountpoint", d.get("mountpoint")), ("device", d.get("device")), ("fstype", d.get("fstype"))], d.get(key))
+            for d in disks
+        ]
+
+    _labelled(w, "piwatch_filesystem_size_bytes", "gauge", "Filesystem size.", rows("total_bytes"), "bytes")
+    _labelled(w, "piwatch_filesystem_used_bytes", "gauge", "Filesystem space used.", rows("used_bytes"), "bytes")
+    _labelled(w, "piwatch_filesystem_free_bytes", "gauge", "Filesystem space free.", rows("free_bytes"), "bytes")
+
+
+def _render_disk_io(w: MetricWriter, disk_io: Dict[str, Any], max_series: int) -> None:
+    devices = sorted((disk_io.get("devices") or {}).items())[:max_series]
+
+    def rows(key: str) -> List[Tuple[List[Tuple[str, Any]], Any]]:
+        return [([("device", name)], stats.get(key)) for name, stats in devices]
+
+    _labelled(w, "piwatch_disk_read_bytes", "counter", "Bytes read from the device.", rows("read_bytes"), "bytes")
+    _labelled(w, "piwatch_disk_written_bytes", "counter", "Bytes written to the device.", rows("write_bytes"), "bytes")
+    _labelled(w, "piwatch_disk_await_milliseconds", "gauge", "Average time per I/O over the last interval.",
+              rows("await_ms"), "milliseconds")
+    _labelled(w, "piwatch_disk_utilization_percent", "gauge", "Time the device was busy over the last interval.",
+              rows("util_percent"))
+
+
+def _render_temperature(w: MetricWriter, temperature: Dict[str, Any], max_series: int) -> None:
+    rows = [
+        ([("sensor", sensor)], temperature.get(key))
+        for sensor, key in (("cpu", "cpu_celsius"), ("gpu", "gpu_celsius"))
+        if temperature.get(key) is not None
+    ]
+    _labelled(w, "piwatch_temperature_celsius", "gauge", "Temperature.", rows, "celsius")
+    # Names repeat (several acpitz zones, two "nvme Composite"), so the
+    # sysfs node label keeps every series unique
+    zones = (temperature.get("zones") or [])[:max_series]
+    _labelled(w, "piwatch_sensor_temperature_celsius", "gauge", "Temperature of every thermal zone and hwmon sensor.",
+              [([("sensor", z.get("name")), ("source", z.get("source")), ("node", z.get("node"))], z.get("celsius"))
+               for z in zones], "celsius")
+
+
+def _render_pressure(w: MetricWriter, pressure: Dict[str, Any]) -> None:
+    rows = []
+    for resource in ("cpu", "memory", "io"):
+        for kind, stats in sorted((pressure.get(resource) or {}).items()):
+            rows.append(([("resource", resource), ("kind", kind)], stats["total_us"] / 1e6))
+    _labelled(w, "piwatch_pressure_stalled_seconds", "counter", "Time tasks were stalled waiting on a resource (PSI).",
+              rows, "seconds")
+    throttling = pressure.get("throttling")
+    if throttling:
+        _labelled(w, "piwatch_throttling_state", "gauge", "Raspberry Pi firmware throttling flags (get_throttled).",
+                  [([("flag", name)], value) for name, value in throttling.items() if name != "raw"])
+
+
+def _render_network(w: MetricWriter, network: Dict[str, Any], max_series: int) -> None:
+    interfaces = sorted((network.get("interfaces") or {}).items())[:max_series]
+    for name, key, help_text, unit in (
+        ("piwatch_network_receive_bytes", "bytes_recv", "Bytes received.", "bytes"),
+        ("piwatch_network_transmit_bytes", "bytes_sent", "Bytes sent.", "bytes"),
+        ("piwatch_network_receive_packets", "packets_recv", "Packets received.", None),
+        ("piwatch_network_transmit_packets", "packets_sent", "Packets sent.", None),
+        ("piwatch_network_receive_errors", "errors_in", "Receive errors.", None),
+        ("piwatch_network_transmit_errors", "errors_out", "Transmit errors.", None),
+        ("piwatch_network_receive_drops", "drops_in", "Received packets dropped.", None),
+        ("piwatch_network_transmit_drops", "drops_out", "Outgoing packets dropped.", None),
+    ):
+        _labelled(w, name, "counter", help_text,
+                  [([("interface", iface)], stats.get(key)) for iface, stats in interfaces], unit)
+
+
+def _render_processes(w: MetricWriter, processes: List[Dict[str, Any]], max_series: int) -> None:
+    # PIDs churn on every restart and would leave a new series each time, so
+    # processes are summed by name (in the snapshot's order) instead
+    totals: Dict[Any, Dict[str, float]] = {}
+    for p in processes:
+        total = totals.setdefault(p.get("name"), {"cpu_percent": 0.0, "memory_percent": 0.0})
+        for key in total:
+            total[key] += p.get(key) or 0.0
+    top = list(totals.items())[:max_series]
+
+    def rows(key: str) -> List[Tuple[List[Tuple[str, Any]], Any]]:
+        return [([("name", name)], total[key]) for name, total in top]
+
+    _labelled(w, "piwatch_process_cpu_percent", "gauge", "CPU usage of the top processes, summed by name.",
+              rows("cpu_percent"))
+    _labelled(w, "piwatch_process_memory_percent", "gauge", "Memory usage of the top processes, summed by name.",
+              rows("memory_percent"))
+
+
+def _render_docker(w: MetricWriter, docker: Dict[str, Any], max_series: int) -> None:
+    containers = docker.get("containers") or []
+    _gauge(w, "piwatch_docker_containers", "Number of Docker containers.", docker.get("container_count"))
+    shown = containers[:max_series]
+    _labelled(w, "piwatch_docker_container_running", "gauge", "Whether a container is running.",
+              [([("name", c.get("name")), ("image", c.get("image"))], c.get("state") == "running") for c in shown])
+    with_stats = [c for c in shown if c.get("stats")]
+    _labelled(w, "piwatch_docker_container_cpu_percent", "gauge", "Container CPU usage.",
+              [([("name", c.get("name"))], c["stats"].get("cpu_percent")) for c in with_stats])
+    _labelled(w, "piwatch_docker_container_memory_bytes", "gauge", "Container memory usage.",
+              [([("name", c.get("name"))], c["stats"].get("memory_bytes")) for c in with_stats], "bytes")
+
+
+def _histogram(w: MetricWriter, name: str, label: str, rows: Dict[str, Dict[str, Any]]) -> None:
+    for key, h in sorted(rows.items()):
+        labels = [(label, key)]
+        for bound, total in zip(BUCKETS, h["buckets"]):
+            w.sample(name + "_bucket", total, labels + [("le", repr(bound))])
+        w.sample(name + "_bucket", h["count"], labels + [("le", "+Inf")])
+        w.sample(name + "_count", h["count"], labels)
+        w.sample(name + "_sum", h["sum"], labels)
+
+
+def _render_agent_stats(w: MetricWriter, agent_stats: Dict[str, Any]) -> None:
+    collectors = agent_stats.get("collectors") or {}
+    routes = agent_stats.get("routes") or {}
+    if collectors:
+        w.family("piwatch_collector_duration_seconds", "histogram", "Time spent in each collector.", "seconds")
+        _histogram(w, "piwatch_collector_duration_seconds", "collector", collectors)
+        _labelled(w, "piwatch_collector_errors", "counter", "Collector calls that raised.",
+                  [([("collector", name)], c["errors"]) for name, c in sorted(collectors.items())])
+        _labelled(w, "piwatch_collector_last_success_timestamp_seconds", "gauge",
+                  "Unix time of the last successful collector call.",
+                  [([("collector", name)], c["last_success"]) for name, c in sorted(collectors.items())], "seconds")
+    if routes:
+        w.family("piwatch_http_request_duration_seconds", "histogram", "Agent request handling time.", "seconds")
+        _histogram(w, "piwatch_http_request_duration_seconds", "route", routes)
+        _labelled(w, "piwatch_http_request_errors", "counter", "Requests answered with a 5xx status.",
+                  [([("route", route)], r["errors"]) for route, r in sorted(routes.items())])
+
+
+def render(
+    snapshot: Dict[str, Any],
+    max_series: int = 32,
+    agent_stats: Optional[Dict[str, Any]] = None,
+) -> memoryview:
+    """Render a sampler snapshot as an OpenMetrics exposition.
+
+    ``max_series`` caps every per-core, per-mount, per-sensor, per-interface,
+    per-process and per-container family so one host can't blow up the
+    scraper's label cardinality. ``agent_stats`` (from
+    ``stats.histograms()``) adds the agent's own collector and request
+    timings.
+    """
+    global _size_hint
+    w = MetricWriter(_size_hint)
+
+    w.family("piwatch_agent", "info", "PiWatch agent version.")
+    w.sample("piwatch_agent_info", 1, [("version", __version__)])
+
+    if snapshot.get("cpu"):
+        _render_cpu(w, snapshot["cpu"], max_series)
+    if snapshot.get("memory"):
+        _render_memory(w, snapshot["memory"])
+    if snapshot.get("disk"):
+        _render_disk(w, snapshot["disk"], max_series)
+    if snapshot.get("disk_io"):
+        _render_disk_io(w, snapshot["disk_io"], max_series)
+    if snapshot.get("temperature"):
+        _render_temperature(w, snapshot["temperature"], max_series)
+    if snapshot.get("pressure"):
+        _render_pressure(w, snapshot["pressure"])
+    if snapshot.get("network"):
+        _render_network(w, snapshot["network"], max_series)
+    if snapshot.get("processes"):
+        _render_processes(w, snapshot["processes"], max_series)
+    if snapshot.get("docker"):
+        _render_docker(w, snapshot["docker"], max_series)
+    if agent_stats:
+        _render_agent_stats(w, agent_stats)
+
+    w.eof()
+    body = w.getvalue()
+    _size_hint = max(_size_hint, len(body))
+    return body
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import gzip
+import http.client
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from piwatch_agent import __version__
+from piwatch_agent import hostinfo
+from piwatch_agent.sampler import Sampler
+
+logger = logging.getLogger("piwatch")
+
+_SPOOL_SUFFIX = ".json.gz"
+
+
+class Pusher:
+    """Push batches of samples to a collector instead of waiting to be polled.
+
+    One sample (the full sampler snapshot) is queued per cpu sample. Every
+    ``batch_seconds`` the queue is gzipped into a batch and POSTed. When a
+    send fails the batch is written to ``spool_dir`` and sending backs off
+    exponentially; once the collector answers again, spooled batches are
+    sent oldest first, before anything newer, so the collector always sees
+    batches in order.
+    """
+
+    def __init__(
+        self,
+        sampler: Sampler,
+        url: str,
+        token: str = "",
+        batch_seconds: float = 10.0,
+        spool_dir: str = "",
+        spool_max_bytes: int = 50 * 1024 * 1024,
+        max_backoff: float = 300.0,
+        timeout: float = 10.0,
+    ) -> None:
+        self._sampler = sampler
+        self._url = urlsplit(url)
+        self._token = token
+        self._batch_seconds = batch_seconds
+        self._spool_dir = spool_dir
+        self._spool_max_bytes = spool_max_bytes
+        self._max_backoff = max_backoff
+        self._timeout = timeout
+
+        self._lock = threading.Lock()
+        # Held for a whole flush: the pusher thread and the final flush at
+        # shutdown must not share the connection or send a spooled batch twice
+        self._flush_lock = threading.Lock()
+        self._samples: List[Dict[str, Any]] = []
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._next_batch = 1
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """Create the spool, subscribe to the sampler and start sending."""
+        if self._spool_dir:
+            try:
+                os.makedirs(self._spool_dir, exist_ok=True)
+                spooled = self._spooled()
+                if spooled:
+                    self._next_batch = int(spooled[-1].split(".")[0]) + 1
+                    logger.info("Push: %d spooled batches waiting to be sent", len(spooled))
+            except (OSError, ValueError) as e:
+                logger.warning("Push spool %s unusable, batches will be dropped while offline: %s",
+                               self._spool_dir, e)
+                self._spool_dir = ""
+        self._sampler.add_listener(self._on_sample)
+        threading.Thread(target=self._loop, name="pusher", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _on_sample(self, name: str, value: Any, timestamp: float) -> None:
+        if name != "cpu":
+            return
+        sample: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+        sample.update(self._sampler.snapshot())
+        with self._lock:
+            self._samples.append(sample)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self._batch_seconds):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Push flush failed")
+
+    def flush(self) -> None:
+        """Send queued samples and any spooled batches, spooling on failure."""
+        with self._flush_lock:
+            with self._lock:
+                samples, self._samples = self._samples, []
+            if samples:
+                batch_no, payload = self._encode(samples)
+                # Older spooled batches must go first, so don't jump the queue
+                if self._spooled() or not self._try_send(payload):
+                    self._spool(batch_no, payload)
+            self._drain_spool()
+
+    def _encode(self, samples: List[Dict[str, Any]]) -> Tuple[int, bytes]:
+        """Return the batch number and gzipped JSON body for ``samples``."""
+        batch_no = self._next_batch
+        self._next_batch += 1
+        batch = {
+            "hostname": hostinfo.facts.hostname(),
+            "agent_version": __version__,
+            "instance": self._sampler.instance,
+            "batch": batch_no,
+            "samples": samples,
+        }
+        return batch_no, gzip.compress(json.dumps(batch, separators=(",", ":")).encode("utf-8"))
+
+    def _try_send(self, payload: bytes) -> bool:
+        """POST one batch. Returns False if it should be retried later."""
+        if time.monotonic() < self._retry_at:
+            return False
+        status = self._post(payload)
+        if status is not None and (200 <= status < 300 or (400 <= status < 500 and status not in (408, 429))):
+            if status >= 400:
+                # The collector will never accept this batch; retrying would block the queue
+                logger.warning("Push: collector rejected batch with HTTP %d, dropping it", status)
+            self._backoff = 0.0
+            self._retry_at = 0.0
+            return True
+        self._backoff = min(max(self._backoff * 2, self._batch_seconds), self._max_backoff)
+        self._retry_at = time.monotonic() + self._backoff * random.uniform(0.5, 1.0)
+        logger.warning("Push to %s failed (%s), retrying in up to %.0fs",
+                       self._url.netloc, status or "unreachable", self._backoff)
+        return False
+
+    def _post(self, payload: bytes) -> Optional[int]:
+        headers = {
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+            "Content-Length": str(len(payload)),
+        }
+        if self._token:
+            headers["X-Auth-Token"] = self._token
+        path = self._url.path or "/"
+        if self._url.query:
+            path += "?" + self._url.query
+        while True:
+            reused = self._conn is not None
+            if self._conn is None:
+                conn_cls = http.client.HTTPSConnection if self._url.scheme == "https" else http.client.HTTPConnection
+                self._conn = conn_cls(self._url.netloc, timeout=self._timeout)
+            try:
+                self._conn.request("POST", path, body=payload, headers=headers)
+                resp = self._conn.getresponse()
+                resp.read()
+                return resp.status
+            except (OSError, http.client.HTTPException) as e:
+                self._conn.close()
+                self._conn = None
+                # A kept-alive connection the collector closed fails once; retry fresh
+                if not reused:
+                    logger.debug("Push POST failed: %s", e)
+                    return None
+
+    def _spooled(self) -> List[str]:
+        if not self._spool_dir:
+            return []
+        return sorted(
+            name for name in os.listdir(self._spool_dir)
+            if name.endswith(_SPOOL_SUFFIX) and not name.startswith(".")
+        )
+
+    def _spool(self, batch_no: int, payload: bytes) -> None:
+        if not self._spool_dir:
+            logger.warning("Push: collector unreachable and no spool, dropping batch")
+            return
+        name = "%012d%s" % (batch_no, _SPOOL_SUFFIX)
+        tmp = os.path.join(self._spool_dir, "." + name)
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, os.path.join(self._spool_dir, name))
+        self._trim_spool()
+
+    def _trim_spool(self) -> None:
+        """Delete the oldest batches once the spool exceeds its size limit."""
+        spooled = self._spooled()
+        sizes = [os.path.getsize(os.path.join(self._spool_dir, name)) for name in spooled]
+        total = sum(sizes)
+        dropped = 0
+        for name, size in zip(spooled, sizes):
+            if total <= self._spool_max_bytes:
+                break
+            os.unlink(os.path.join(self._spool_dir, name))
+            total -= size
+            dropped += 1
+        if dropped:
+            logger.warning("Push spool full, dropped %d oldest batches", dropped)
+
+    def _drain_spool(self) -> None:
+        for name in self._spooled():
+            path = os.path.join(self._spool_dir, name)
+            with open(path, "rb") as f:
+                payload = f.read()
+            if not self._try_send(payload):
+                return
+            os.unlink(path)
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import platform
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+# Kernel counters are unsigned longs, so they wrap at 2**32 on 32-bit
+# kernels (armv6l/armv7l Pi OS). A 32-bit userland on an arm64 kernel still
+# gets 64-bit counters, hence checking the kernel's machine, not Python's.
+_KERNEL_64BIT = platform.machine().endswith("64")
+_LONG_BITS = 64 if _KERNEL_64BIT else 32
+
+
+def counter_delta(old: int, new: int, bits: Optional[int] = None) -> Optional[int]:
+    """Return how far a kernel counter advanced from ``old`` to ``new``.
+
+    ``bits`` is the counter's width, by default the kernel's unsigned long.
+    A decrease from a value that fit in a counter narrower than 64 bits is
+    a wrap. Anything else is a reset (device re-plugged, interface
+    re-created), for which no delta is known.
+    """
+    if new >= old:
+        return new - old
+    wrap = 1 << (bits or _LONG_BITS)
+    if wrap <= 1 << 32 and old < wrap:
+        return new + wrap - old
+    return None
+
+
+class CounterRates:
+    """Keep the previous sample of named counters per key and diff them.
+
+    Keys are devices or interfaces; ``retain`` drops the state of keys
+    that disappeared so a device that comes back starts fresh instead of
+    being diffed against counters from its previous life. ``widths`` gives
+    the bit width of counters the kernel keeps narrower than an unsigned
+    long, so they wrap correctly on 64-bit kernels too.
+    """
+
+    def __init__(self, widths: Optional[Dict[str, int]] = None) -> None:
+        self._prev: Dict[str, Tuple[float, Dict[str, int]]] = {}
+        self._widths = widths or {}
+
+    def update(
+        self, key: str, counters: Dict[str, int], now: Optional[float] = None,
+    ) -> Tuple[Optional[float], Dict[str, Optional[int]]]:
+        """Store ``counters`` for ``key``; return (elapsed seconds, deltas).
+
+        On the first sample of a key elapsed is None and every delta is None.
+        """
+        if now is None:
+            now = time.monotonic()
+        prev = self._prev.get(key)
+        self._prev[key] = (now, counters)
+        if prev is None or now <= prev[0]:
+            return None, {name: None for name in counters}
+        prev_at, prev_counters = prev
+        deltas = {}
+        for name, value in counters.items():
+            old = prev_counters.get(name)
+            deltas[name] = None if old is None else counter_delta(old, value, self._widths.get(name))
+        return now - prev_at, deltas
+
+    def rates(
+        self, key: str, counters: Dict[str, int], now: Optional[float] = None,
+    ) -> Dict[str, Optional[float]]:
+        """Store ``counters`` for ``key`` and return per-second rates."""
+        elapsed, deltas = self.update(key, counters, now)
+        return {
+            name: None if elapsed is None or delta is None else delta / elapsed
+            for name, delta in deltas.items()
+        }
+
+    def retain(self, keys: Iterable[str]) -> None:
+        """Forget every key not in ``keys``."""
+        keep = set(keys)
+        for key in [k for k in self._prev if k not in keep]:
+            del self._prev[key]
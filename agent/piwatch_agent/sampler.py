@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from piwatch_agent.stats import stats
+
+logger = logging.getLogger("piwatch")
+
+
+def safe_collect(collector_fn: Any, *args: Any) -> Any:
+    """Call a collector function, returning None on any exception.
+
+    Every call is timed into ``stats`` under the collector's module name.
+    """
+    target = getattr(collector_fn, "func", collector_fn)
+    name = target.__module__.rpartition(".")[2]
+    started = time.perf_counter()
+    try:
+        value = collector_fn(*args)
+    except Exception as e:
+        stats.record_collector(name, time.perf_counter() - started, e)
+        logger.warning("Collector %s failed: %s", target.__module__, e)
+        return None
+    stats.record_collector(name, time.perf_counter() - started)
+    return value
+
+
+class Sampler:
+    """Run collectors in the background and keep their latest output.
+
+    Each collector gets its own daemon thread and interval, so a slow
+    collector (docker, processes) never delays a fast one (cpu). Readers
+    get the cached values without waiting on any collector.
+    """
+
+    def __init__(self, schedule: Dict[str, Tuple[Callable[[], Any], float]]) -> None:
+        self._schedule = schedule
+        self._lock = threading.Lock()
+        self._values: Dict[str, Any] = {}
+        self._stamps: Dict[str, float] = {}
+        # Sequence numbers let clients fetch only the sections that changed.
+        # The instance id keeps cursors from a previous agent run invalid.
+        self.instance = "%x" % int(time.time() * 1000)
+        self._seq = 0
+        self._changed: Dict[str, int] = {}
+        self._ready = {name: threading.Event() for name in schedule}
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._listeners: List[Callable[[str, Any, float], None]] = []
+
+    def add_listener(self, fn: Callable[[str, Any, float], None]) -> None:
+        """Register ``fn(name, value, timestamp)`` to run after every sample."""
+        self._listeners.append(fn)
+
+    def start(self) -> None:
+        """Start one sampling thread per collector."""
+        for name, (fn, interval) in self._schedule.items():
+            t = threading.Thread(
+                target=self._loop,
+                args=(name, fn, interval),
+                name="sampler-%s" % name,
+                daemon=True,
+            )
+            t.start()
+            self._threads.append(t)
+
+    def stop(self) -> None:
+        """Signal all sampling threads to exit."""
+        self._stop.set()
+
+    def wait_stopped(self, timeout: float) -> bool:
+        """Sleep up to ``timeout`` seconds; return True if the sampler stopped."""
+        return self._stop.wait(timeout)
+
+    def _loop(self, name: str, fn: Callable[[], Any], interval: float) -> None:
+        while not self._stop.is_set():
+            started = time.monotonic()
+            value = safe_collect(fn)
+            now = time.time()
+            with self._lock:
+                if name not in self._changed or self._values.get(name) != value:
+                    self._seq += 1
+                    self._changed[name] = self._seq
+                self._values[name] = value
+                self._stamps[name] = now
+            self._ready[name].set()
+            for listener in self._listeners:
+                try:
+                    listener(name, value, now)
+                except Exception:
+                    logger.exception("Sampler listener failed for %s", name)
+            elapsed = time.monotonic() - started
+            self._stop.wait(max(interval - elapsed, 0.0))
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until every collector has produced a first sample."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for event in self._ready.values():
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            if not event.wait(remaining):
+                return False
+        return True
+
+    def get(self, name: str) -> Any:
+        """Return the latest value for a single collector."""
+        with self._lock:
+            return self._values.get(name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the latest value of every collector."""
+        with self._lock:
+            return {name: self._values.get(name) for name in self._schedule}
+
+    def cursor(self) -> str:
+        """Return an opaque cursor identifying the current snapshot."""
+        with self._lock:
+            return "%s-%d" % (self.instance, self._seq)
+
+    def changes_since(self, cursor: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Return the current cursor and the sections changed after ``cursor``.
+
+        The sections are None when the cursor is unknown (malformed, from a
+        previous agent run, or from the future), meaning the caller needs a
+        full snapshot.
+        """
+        instance, _, seq_text = cursor.rpartition("-")
+        with self._lock:
+            current = "%s-%d" % (self.instance, self._seq)
+            try:
+                seq = int(seq_text)
+            except ValueError:
+                return current, None
+            if instance != self.instance or seq > self._seq:
+                return current, None
+            return current, {
+                name: self._values.get(name)
+                for name, changed in self._changed.items()
+                if changed > seq
+            }
+
+    def collected_at(self, name: str) -> Optional[float]:
+        """Return the wall-clock time of the latest sample for a collector."""
+        with self._lock:
+            return self._stamps.get(name)
+
+    def collected_times(self) -> Dict[str, float]:
+        """Return the wall-clock time of the latest sample of every collector."""
+        with self._lock:
+            return dict(self._stamps)
@@ -3,18 +3,36 @@ from __future__ import annotations
 import json
 import logging
 import os
+import selectors
+import signal
 import socket
 import subprocess
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from functools import partial
 from http.server import HTTPServer, BaseHTTPRequestHandler
-from typing import Any, Dict, Optional
+from typing import Any, Deque, Dict, Optional, Tuple
+from urllib.parse import parse_qs
 
 import psutil
 
 from piwatch_agent import __version__
+from piwatch_agent import alerts
 from piwatch_agent import config
-from piwatch_agent.collectors import cpu, memory, disk, temperature, network, system, cron, process, docker, wifi
+from piwatch_agent import discovery
+from piwatch_agent import encoding
+from piwatch_agent import hostinfo
+from piwatch_agent import prometheus
+from piwatch_agent.collectors import cpu, memory, disk, diskio, temperature, network, pressure, system, cron, process, docker, wifi
+from piwatch_agent.gateway import Gateway
+from piwatch_agent.history import History
+from piwatch_agent.push import Pusher
+from piwatch_agent.sampler import Sampler, safe_collect
+from piwatch_agent.stats import stats
+from piwatch_agent.store import Store
 
 logger = logging.getLogger("piwatch")
 
@@ -29,42 +47,294 @@ def _now_iso() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
 
-def _get_default_ip() -> str:
-    """Get the default outgoing IP address."""
-    try:
-        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-            s.connect(("8.8.8.8", 80))
-            return s.getsockname()[0]
-    except OSError:
-        return "127.0.0.1"
+def _collected_at(sampler: Sampler) -> Dict[str, str]:
+    """Return when each section was last sampled, as ISO 8601 timestamps."""
+    return {
+        name: datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        for name, ts in sampler.collected_times().items()
+    }
+
+
+def _build_sampler() -> Sampler:
+    """Create the background sampler for the /metrics collectors.
+
+    Each collector runs at its own interval from ``config.REFRESH``.
+    """
+    collectors = {
+        "cpu": partial(cpu.collect, interval=None),
+        "memory": memory.collect,
+        "disk": disk.collect,
+        "disk_io": diskio.collect,
+        "pressure": pressure.collect,
+        "temperature": temperature.collect,
+        "network": network.collect,
+        "processes": process.collect,
+        "docker": docker.collect,
+    }
+    unknown = set(config.REFRESH) - set(collectors)
+    if unknown:
+        logger.warning("PIWATCH_REFRESH: ignoring unknown collectors %s", ", ".join(sorted(unknown)))
+    return Sampler({
+        name: (fn, config.REFRESH.get(name, config.SAMPLE_INTERVAL))
+        for name, fn in collectors.items()
+    })
+
+
+def _attach_history(sampler: Sampler) -> History:
+    """Create the history ring buffer and feed it one row per cpu sample."""
+    history = History(config.HISTORY_SIZE, psutil.cpu_count(logical=True) or 1)
+
+    def on_sample(name: str, value: Any, timestamp: float) -> None:
+        if name == "cpu":
+            history.record(timestamp, sampler.snapshot())
+
+    sampler.add_listener(on_sample)
+    return history
+
+
+def _attach_store(sampler: Sampler) -> Optional[Store]:
+    """Open the on-disk store and feed it one row per cpu sample."""
+    store = Store(config.STORE_DIR, config.STORE_FLUSH_SECONDS, config.STORE_RETENTION)
+    if not store.open():
+        return None
 
+    def on_sample(name: str, value: Any, timestamp: float) -> None:
+        if name == "cpu":
+            store.record(timestamp, sampler.snapshot())
+
+    sampler.add_listener(on_sample)
+    store.start()
+    return store
+
+
+class PiWatchServer(HTTPServer):
+    """HTTP server that owns the agent's background sampler.
+
+    Connections are handed to a bounded pool of worker threads so a slow
+    route (/cron, /wifi) doesn't block other clients. A worker is only held
+    while a request is being handled: between requests, kept-alive
+    connections wait in a selector on the ``piwatch-idle`` thread and go
+    back to the pool once the client sends again, so idle pollers can't
+    use up the workers. With ``workers <= 0`` requests are served one at a
+    time on the listening thread.
+    """
+
+    def __init__(
+        self,
+        address: Any,
+        handler: Any,
+        sampler: Sampler,
+        workers: int = 0,
+        history: Optional[History] = None,
+        max_streams: int = 0,
+        gateway: Optional[Gateway] = None,
+        store: Optional[Store] = None,
+        alert_engine: Optional[alerts.AlertEngine] = None,
+    ) -> None:
+        super().__init__(address, handler)
+        self.sampler = sampler
+        self.history = history
+        self.store = store
+        self.alert_engine = alert_engine
+        self.gateway = gateway
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # A kept-alive connection would monopolise the only serving thread
+        self.keep_alive = workers > 0
+        # Each stream pins a thread for as long as it runs, so streams get
+        # threads of their own on top of ``workers``: however many viewers
+        # are connected, polls always have every worker to themselves.
+        slots = max_streams if workers > 0 else 0
+        self.stream_slots = threading.BoundedSemaphore(slots) if slots > 0 else None
+        self._closing = False
+        self._parked: Deque[Tuple[Any, Any]] = deque()
+        if workers > 0:
+            self._pool = ThreadPoolExecutor(max_workers=workers + max(slots, 0), thread_name_prefix="piwatch-http")
+            # Handing a connection to the idle thread wakes its select()
+            self._wake_r, self._wake_w = socket.socketpair()
+            self._idle_thread = threading.Thread(target=self._idle_loop, name="piwatch-idle", daemon=True)
+            self._idle_thread.start()
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        if self._pool is None:
+            super().process_request(request, client_address)
+            return
+        self._pool.submit(self._process_request_worker, request, client_address)
 
-def _safe_collect(collector_fn: Any, *args: Any) -> Any:
-    """Call a collector function, returning None on any exception."""
-    try:
-        return collector_fn(*args)
-    except Exception as e:
-        logger.warning("Collector %s failed: %s", collector_fn.__module__, e)
-        return None
+    def _process_request_worker(self, request: Any, client_address: Any) -> None:
+        park = False
+        try:
+            handler = self.RequestHandlerClass(request, client_address, self)
+            park = getattr(handler, "parked", False)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            if park:
+                self._parked.append((request, client_address))
+                try:
+                    self._wake_w.send(b"\0")
+                except OSError:
+                    pass
+            else:
+                self.shutdown_request(request)
+
+    def _idle_loop(self) -> None:
+        """Wait for parked keep-alive connections to send their next request."""
+        timeout = self.RequestHandlerClass.timeout
+        idle = selectors.DefaultSelector()
+        idle.register(self._wake_r, selectors.EVENT_READ)
+        try:
+            while not self._closing:
+                for key, _ in idle.select(timeout=1.0):
+                    if key.fileobj is self._wake_r:
+                        self._wake_r.recv(4096)
+                        continue
+                    idle.unregister(key.fileobj)
+                    self._pool.submit(self._process_request_worker, key.fileobj, key.data[0])
+                now = time.monotonic()
+                while self._parked:
+                    request, client_address = self._parked.popleft()
+                    idle.register(request, selectors.EVENT_READ, (client_address, now))
+                if timeout is None:
+                    continue
+                for key in list(idle.get_map().values()):
+                    if key.data is not None and now - key.data[1] > timeout:
+                        idle.unregister(key.fileobj)
+                        self.shutdown_request(key.fileobj)
+        except Exception:
+            logger.exception("Keep-alive connection loop failed")
+        finally:
+            for key in list(idle.get_map().values()):
+                if key.data is not None:
+                    self.shutdown_request(key.fileobj)
+            while self._parked:
+                self.shutdown_request(self._parked.popleft()[0])
+            idle.close()
+            self._wake_r.close()
+
+    def server_close(self) -> None:
+        super().server_close()
+        if self._pool is not None:
+            self._closing = True
+            try:
+                self._wake_w.send(b"\0")
+            except OSError:
+                pass
+            self._idle_thread.join(timeout=2)
+            self._wake_w.close()
+            self._pool.shutdown(wait=False)
 
 
 class PiWatchHandler(BaseHTTPRequestHandler):
     """HTTP request handler for PiWatch agent."""
 
+    # HTTP/1.1 keeps connections alive between polls; idle ones wait in the
+    # server's selector rather than on a worker, and are closed after the
+    # timeout.
+    protocol_version = "HTTP/1.1"
+    timeout = config.KEEPALIVE_TIMEOUT
+    # Headers and body go out in separate writes; don't let Nagle hold the
+    # body back waiting for the client's delayed ACK on a reused connection.
+    disable_nagle_algorithm = True
+
+    def setup(self) -> None:
+        super().setup()
+        self.parked = False
+        if not getattr(self.server, "keep_alive", True):
+            self.protocol_version = "HTTP/1.0"
+
+    def handle(self) -> None:
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection:
+            if getattr(self.server, "keep_alive", False) and not self._request_buffered():
+                # Give the worker back; the server resumes us when the client sends
+                self.parked = True
+                return
+            self.handle_one_request()
+
+    def _request_buffered(self) -> bool:
+        """Whether the client has already sent (part of) its next request.
+
+        Anything read ahead into ``rfile`` would be lost once the connection
+        is parked, so pipelined requests are served on this worker.
+        """
+        self.connection.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
     def log_message(self, format: str, *args: Any) -> None:
         logger.info(format, *args)
 
-    def _send_json(self, data: Any, status: int = 200) -> None:
-        body = _json_response(data)
+    def send_response(self, code: int, message: Optional[str] = None) -> None:
+        self._status = code
+        super().send_response(code, message)
+
+    def _record_request(self, method: str, route: str, started: float) -> None:
+        # Unhandled exceptions never sent a response; count them as 500s
+        status = getattr(self, "_status", 500)
+        self._status = 500
+        stats.record_request("%s %s" % (method, route), time.perf_counter() - started, status)
+
+    def _send_json(self, data: Any, status: int = 200, headers: Optional[Dict[str, str]] = None) -> None:
+        """Send ``data`` as JSON, or as MessagePack if the client's Accept prefers it."""
+        headers = dict(headers or {})
+        headers["Vary"] = "Accept, Accept-Encoding"
+        if encoding.wants_msgpack(self.headers.get("Accept")):
+            self._send_body(encoding.msgpack_dumps(data), encoding.MSGPACK_CONTENT_TYPE, status, headers)
+        else:
+            self._send_body(_json_response(data), "application/json", status, headers)
+
+    def _send_body(
+        self,
+        body: Any,
+        content_type: str,
+        status: int = 200,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Send a complete response; ``body`` is any bytes-like object.
+
+        Bodies of at least COMPRESS_MIN_BYTES are gzip/deflate compressed
+        when the client's Accept-Encoding allows it.
+        """
+        headers = headers or {}
+        coding = None
+        if config.COMPRESS_LEVEL > 0 and len(body) >= config.COMPRESS_MIN_BYTES:
+            coding = encoding.negotiate_encoding(self.headers.get("Accept-Encoding"))
+        if coding is not None:
+            body = encoding.compress(body, coding, config.COMPRESS_LEVEL)
+
         self.send_response(status)
-        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Type", content_type)
         self.send_header("Content-Length", str(len(body)))
+        if coding is not None:
+            self.send_header("Content-Encoding", coding)
+        if "Vary" not in headers:
+            self.send_header("Vary", "Accept-Encoding")
+        for key, value in headers.items():
+            self.send_header(key, value)
         self.send_header("Access-Control-Allow-Origin", "*")
         self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
         self.send_header("Access-Control-Allow-Headers", "Content-Type, X-Auth-Token")
         self.end_headers()
         self.wfile.write(body)
 
+    def _send_not_modified(self, etag: str) -> None:
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+
+    def _query(self) -> Dict[str, str]:
+        """Return the request's query string as a dict of first values."""
+        if "?" not in self.path:
+            return {}
+        qs = parse_qs(self.path.split("?", 1)[1])
+        return {key: values[0] for key, values in qs.items()}
+
     def _check_auth(self) -> bool:
         """Check X-Auth-Token header against configured token."""
         if not config.TOKEN:
@@ -74,6 +344,7 @@ class PiWatchHandler(BaseHTTPRequestHandler):
 
     def _read_body(self) -> Optional[Dict[str, Any]]:
         """Read and parse JSON request body."""
+        self._body_consumed = True
         length = int(self.headers.get("Content-Length", 0))
         if length == 0:
             return {}
@@ -83,50 +354,92 @@ class PiWatchHandler(BaseHTTPRequestHandler):
         except (json.JSONDecodeError, ValueError):
             return None
 
+    def _discard_body(self, limit: int = 65536) -> None:
+        """Drain an unread request body so the connection can be reused."""
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = limit + 1
+        if 0 < length <= limit:
+            self.rfile.read(length)
+        elif length > limit:
+            self.close_connection = True
+
     def do_OPTIONS(self) -> None:
         self.send_response(204)
+        self.send_header("Content-Length", "0")
         self.send_header("Access-Control-Allow-Origin", "*")
         self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
         self.send_header("Access-Control-Allow-Headers", "Content-Type, X-Auth-Token")
         self.end_headers()
 
     def do_GET(self) -> None:
+        started = time.perf_counter()
         path = self.path.split("?")[0].rstrip("/") or "/"
+        route = path
 
-        if path == "/health":
-            self._handle_health()
-        elif path == "/metrics":
-            self._handle_metrics()
-        elif path == "/cron":
-            self._handle_cron()
-        elif path == "/wifi":
-            self._handle_wifi_get()
-        elif path == "/discover":
-            self._handle_discover()
-        else:
-            self._send_json({"error": "Not Found"}, 404)
+        try:
+            if path == "/health":
+                self._handle_health()
+            elif path == "/metrics":
+                self._handle_metrics()
+            elif path == "/metrics/history":
+                self._handle_metrics_history()
+            elif path == "/metrics/range":
+                self._handle_metrics_range()
+            elif path == "/metrics/prom":
+                self._handle_metrics_prom()
+            elif path == "/metrics/stream":
+                self._handle_metrics_stream()
+            elif path == "/processes":
+                self._handle_processes()
+            elif path == "/cron":
+                self._handle_cron()
+            elif path == "/wifi":
+                self._handle_wifi_get()
+            elif path == "/discover":
+                self._handle_discover()
+            elif path == "/fleet":
+                self._handle_fleet()
+            elif path == "/alerts":
+                self._handle_alerts()
+            elif path == "/agent/stats":
+                self._send_json(stats.to_dict())
+            else:
+                route = "other"
+                self._send_json({"error": "Not Found"}, 404)
+        finally:
+            self._record_request("GET", route, started)
 
     def do_POST(self) -> None:
+        started = time.perf_counter()
         path = self.path.split("?")[0].rstrip("/") or "/"
+        route = path
+        self._body_consumed = False
 
-        if path == "/reboot":
-            self._handle_reboot()
-        elif path == "/cron":
-            self._handle_cron_post()
-        elif path == "/wifi":
-            self._handle_wifi_post()
-        else:
-            self._send_json({"error": "Not Found"}, 404)
+        try:
+            if path == "/reboot":
+                self._handle_reboot()
+            elif path == "/cron":
+                self._handle_cron_post()
+            elif path == "/wifi":
+                self._handle_wifi_post()
+            else:
+                route = "other"
+                self._send_json({"error": "Not Found"}, 404)
+
+            if not self._body_consumed:
+                self._discard_body()
+        finally:
+            self._record_request("POST", route, started)
 
     def _handle_health(self) -> None:
-        boot_time = psutil.boot_time()
-        uptime = int(time.time() - boot_time)
-        sys_info = _safe_collect(system.collect) or {}
+        sys_info = safe_collect(system.collect) or {}
         self._send_json({
-            "hostname": socket.gethostname(),
-            "uptime_seconds": uptime,
+            "hostname": hostinfo.facts.hostname(),
+            "uptime_seconds": hostinfo.facts.uptime_seconds(),
             "agent_version": __version__,
-            "ip_address": _get_default_ip(),
+            "ip_address": hostinfo.default_ip(),
             "model": sys_info.get("model"),
             "os_name": sys_info.get("os_name"),
             "os_version": sys_info.get("os_version"),
@@ -136,19 +449,189 @@ class PiWatchHandler(BaseHTTPRequestHandler):
         })
 
     def _handle_metrics(self) -> None:
-        self._send_json({
-            "timestamp": _now_iso(),
-            "cpu": _safe_collect(cpu.collect),
-            "memory": _safe_collect(memory.collect),
-            "disk": _safe_collect(disk.collect),
-            "temperature": _safe_collect(temperature.collect),
-            "network": _safe_collect(network.collect),
-            "processes": _safe_collect(process.collect),
-            "docker": _safe_collect(docker.collect),
-        })
+        """Serve the latest snapshot, or only what changed since a cursor.
+
+        ``?since=<cursor>`` returns just the sections that changed after the
+        cursor (``"delta": true``). An up-to-date cursor, or an ``ETag`` sent
+        back in ``If-None-Match``, gets ``304 Not Modified``. Every response
+        carries the new cursor in its body and ``ETag``, plus a
+        ``collected_at`` map saying when each section was last sampled.
+        """
+        sampler = self.server.sampler
+        since = self._query().get("since")
+        delta = since is not None
+        if since is None:
+            since = self.headers.get("If-None-Match", "").strip('"') or None
+
+        data: Dict[str, Any] = {"timestamp": _now_iso()}
+        if since is not None:
+            cursor, changes = sampler.changes_since(since)
+            if changes is not None and not changes:
+                self._send_not_modified('"%s"' % cursor)
+                return
+            if changes is not None and delta:
+                data.update({"cursor": cursor, "delta": True, "collected_at": _collected_at(sampler)})
+                data.update(changes)
+                self._send_json(data, headers={"ETag": '"%s"' % cursor})
+                return
+
+        # Read the cursor first so a sample landing in between is resent
+        cursor = sampler.cursor()
+        data.update({"cursor": cursor, "delta": False, "collected_at": _collected_at(sampler)})
+        data.update(sampler.snapshot())
+        self._send_json(data, headers={"ETag": '"%s"' % cursor})
+
+    def _handle_metrics_history(self) -> None:
+        history = self.server.history
+        if history is None:
+            self._send_json({"error": "History is disabled"}, 404)
+            return
+        try:
+            since = float(self._query().get("since", 0))
+        except ValueError:
+            self._send_json({"error": "since must be a unix timestamp"}, 400)
+            return
+        data = history.since(since)
+        data["interval_seconds"] = config.REFRESH["cpu"]
+        self._send_json(data)
+
+    def _handle_metrics_range(self) -> None:
+        """Serve stored samples between ``start`` and ``end`` (unix timestamps).
+
+        ``?tier=raw|hourly|daily`` picks the resolution (by default the
+        finest that covers the range), ``?series=a,b`` limits the columns.
+        ``?format=binary`` returns the packed rows exactly as stored, written
+        straight from the segment maps; the row layout is given in the
+        X-PiWatch-Row-Format (a Python struct format) and
+        X-PiWatch-Columns headers.
+        """
+        store = self.server.store
+        if store is None:
+            self._send_json({"error": "The store is disabled"}, 404)
+            return
+        query = self._query()
+        now = time.time()
+        try:
+            end = float(query.get("end", now))
+            start = float(query.get("start", end - 3600))
+        except ValueError:
+            self._send_json({"error": "start and end must be unix timestamps"}, 400)
+            return
+        tier = query.get("tier") or store.pick_tier(start, end, now)
+        if tier not in ("raw", "hourly", "daily"):
+            self._send_json({"error": "tier must be raw, hourly or daily"}, 400)
+            return
+
+        if query.get("format") == "binary":
+            with store.slices(tier, start, end) as chunks:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(sum(len(chunk) for chunk in chunks)))
+                self.send_header("X-PiWatch-Tier", tier)
+                self.send_header("X-PiWatch-Row-Format", store.row_format(tier))
+                self.send_header("X-PiWatch-Columns", ",".join(store.COLUMNS))
+                self.send_header("Access-Control-Allow-Origin", "*")
+                self.send_header("Access-Control-Expose-Headers", "X-PiWatch-Tier, X-PiWatch-Row-Format, X-PiWatch-Columns")
+                self.end_headers()
+                for chunk in chunks:
+                    self.wfile.write(chunk)
+            return
+
+        series = query.get("series")
+        self._send_json(store.query(tier, start, end, series.split(",") if series else None))
+
+    def _handle_metrics_prom(self) -> None:
+        body = prometheus.render(self.server.sampler.snapshot(), config.PROM_MAX_SERIES, stats.histograms())
+        self._send_body(body, prometheus.CONTENT_TYPE)
+
+    def _handle_metrics_stream(self) -> None:
+        """Stream snapshots as Server-Sent Events or newline-delimited JSON.
+
+        ``?interval=<seconds>`` sets the pace (never faster than
+        STREAM_MIN_INTERVAL) and ``?format=sse|ndjson`` the framing. All
+        viewers read the shared sampler, so extra viewers cost no extra
+        collection.
+        """
+        query = self._query()
+        fmt = query.get("format", "sse")
+        if fmt not in ("sse", "ndjson"):
+            self._send_json({"error": "format must be sse or ndjson"}, 400)
+            return
+        try:
+            interval = float(query.get("interval", config.REFRESH["cpu"]))
+        except ValueError:
+            self._send_json({"error": "interval must be a number of seconds"}, 400)
+            return
+        interval = max(interval, config.STREAM_MIN_INTERVAL)
+
+        slots = self.server.stream_slots
+        if slots is None or not slots.acquire(blocking=False):
+            self._send_json({"error": "Too many streams"}, 503)
+            return
+        try:
+            self._stream_metrics(fmt, interval)
+        finally:
+            slots.release()
+
+    def _stream_metrics(self, fmt: str, interval: float) -> None:
+        sampler = self.server.sampler
+        sse = fmt == "sse"
+
+        # No Content-Length: the body runs until either side closes
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream" if sse else "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+
+        last_cursor = None
+        try:
+            while True:
+                cursor = sampler.cursor()
+                if cursor != last_cursor:
+                    data: Dict[str, Any] = {
+                        "timestamp": _now_iso(), "cursor": cursor, "collected_at": _collected_at(sampler),
+                    }
+                    data.update(sampler.snapshot())
+                    body = _json_response(data)
+                    if sse:
+                        self.wfile.write(b"id: %s\nevent: metrics\ndata: %s\n\n" % (cursor.encode(), body))
+                    else:
+                        self.wfile.write(body + b"\n")
+                    last_cursor = cursor
+                elif sse:
+                    # Comment line: keeps proxies from timing out and detects gone clients
+                    self.wfile.write(b": keep-alive\n\n")
+                if sampler.wait_stopped(interval):
+                    return
+        except OSError:
+            # Client went away
+            return
+
+    def _handle_fleet(self) -> None:
+        gateway = self.server.gateway
+        if gateway is None:
+            self._send_json({"error": "Gateway mode is disabled (set PIWATCH_PEERS)"}, 404)
+            return
+        self._send_json(gateway.snapshot())
+
+    def _handle_processes(self) -> None:
+        query = self._query()
+        sort = query.get("sort", "cpu")
+        if sort not in process.SORT_KEYS:
+            self._send_json({"error": "sort must be one of: %s" % ", ".join(process.SORT_KEYS)}, 400)
+            return
+        try:
+            limit = int(query.get("limit", 15))
+        except ValueError:
+            self._send_json({"error": "limit must be an integer"}, 400)
+            return
+        self._send_json(process.top(max(limit, 0), sort))
 
     def _handle_cron(self) -> None:
-        data = _safe_collect(cron.collect)
+        data = safe_collect(cron.collect)
         self._send_json(data if data is not None else {"users": {}, "system": {"jobs": []}})
 
     def _handle_cron_post(self) -> None:
@@ -172,7 +655,7 @@ class PiWatchHandler(BaseHTTPRequestHandler):
         self._send_json(result, status)
 
     def _handle_wifi_get(self) -> None:
-        info = _safe_collect(wifi.collect)
+        info = safe_collect(wifi.collect)
         self._send_json(info if info is not None else {"error": "Failed to collect WiFi info"})
 
     def _handle_wifi_post(self) -> None:
@@ -206,19 +689,21 @@ class PiWatchHandler(BaseHTTPRequestHandler):
         except FileNotFoundError:
             pass
 
+    def _handle_alerts(self) -> None:
+        """Serve rule states, firing alerts and the events after ``?since=<cursor>``."""
+        engine = self.server.alert_engine
+        if engine is None:
+            self._send_json({"error": "Alerting is disabled"}, 404)
+            return
+        since = self._query().get("since")
+        if since is not None and since == engine.cursor():
+            self._send_not_modified('"%s"' % since)
+            return
+        data = engine.since(since)
+        self._send_json(data, headers={"ETag": '"%s"' % data["cursor"]})
+
     def _handle_discover(self) -> None:
-        sys_info = _safe_collect(system.collect) or {}
-        self._send_json({
-            "service": "piwatch-agent",
-            "version": __version__,
-            "hostname": socket.gethostname(),
-            "ip_address": _get_default_ip(),
-            "port": config.PORT,
-            "model": sys_info.get("model"),
-            "os": sys_info.get("os_name"),
-            "architecture": sys_info.get("architecture"),
-            "timestamp": _now_iso(),
-        })
+        self._send_json(discovery.payload())
 
 
 def run() -> None:
@@ -228,11 +713,75 @@ def run() -> None:
         format="%(asctime)s [%(levelname)s] %(message)s",
     )
 
-    server = HTTPServer((config.HOST, config.PORT), PiWatchHandler)
-    logger.info("PiWatch agent v%s starting on %s:%d", __version__, config.HOST, config.PORT)
+    hostinfo.facts.watch_routes()
+    sampler = _build_sampler()
+    history = _attach_history(sampler) if config.HISTORY_SIZE > 0 else None
+    store = _attach_store(sampler) if config.STORE_DIR else None
+    alert_engine = None
+    rules = alerts.parse_rules(config.ALERT_RULES)
+    if rules:
+        alert_engine = alerts.AlertEngine(rules, config.ALERT_EVENTS)
+        sampler.add_listener(alert_engine.on_sample)
+    pusher = None
+    if config.PUSH_URL:
+        pusher = Pusher(
+            sampler,
+            config.PUSH_URL,
+            token=config.PUSH_TOKEN,
+            batch_seconds=config.PUSH_BATCH_SECONDS,
+            spool_dir=config.PUSH_SPOOL_DIR,
+            spool_max_bytes=config.PUSH_SPOOL_MAX_BYTES,
+        )
+        pusher.start()
+        logger.info("Pushing samples to %s every %.0fs", config.PUSH_URL, config.PUSH_BATCH_SECONDS)
+    gateway = None
+    if config.PEERS:
+        gateway = Gateway(
+            config.PEERS,
+            config.PORT,
+            interval=config.GATEWAY_INTERVAL,
+            concurrency=config.GATEWAY_CONCURRENCY,
+            timeout=config.GATEWAY_TIMEOUT,
+        )
+        gateway.start()
+        logger.info("Gateway mode: polling %d peers every %.0fs", len(config.PEERS), config.GATEWAY_INTERVAL)
+    responder = None
+    if config.DISCOVERY:
+        responder = discovery.DiscoveryResponder(config.DISCOVERY_PORT, config.DISCOVERY_GROUP)
+        if not responder.start():
+            responder = None
+    sampler.start()
+    # Don't answer /metrics with empty sections right after startup
+    sampler.wait_ready(timeout=config.SAMPLE_INTERVAL * 2)
+
+    server = PiWatchServer(
+        (config.HOST, config.PORT), PiWatchHandler, sampler,
+        workers=config.WORKERS, history=history, max_streams=config.STREAM_MAX_CLIENTS,
+        gateway=gateway, store=store, alert_engine=alert_engine,
+    )
+    logger.info(
+        "PiWatch agent v%s starting on %s:%d (%d workers)",
+        __version__, config.HOST, config.PORT, config.WORKERS,
+    )
+
+    def _terminate(signum: int, frame: Any) -> None:
+        # systemd stops the agent with SIGTERM; take the same path as Ctrl+C
+        raise KeyboardInterrupt
 
+    signal.signal(signal.SIGTERM, _terminate)
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         logger.info("Shutting down...")
+        sampler.stop()
+        if gateway is not None:
+            gateway.stop()
+        if responder is not None:
+            responder.stop()
+        if store is not None:
+            store.stop()
+        if pusher is not None:
+            pusher.stop()
+            # Send (or spool) the last partial batch
+            pusher.flush()
         server.shutdown()
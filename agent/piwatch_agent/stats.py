@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+# Upper bounds (seconds) of the latency buckets; the last bucket is +Inf.
+# Spans a fast /proc read (<1ms) to a docker CLI call timing out (10s).
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram.
+
+    ``observe`` is a bisect and three additions, so it is cheap enough to
+    run on every collector call and request even on a Pi Zero.
+    """
+
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def cumulative(self) -> List[int]:
+        """Return per-bucket counts of observations <= each bound (then +Inf)."""
+        total = 0
+        result = []
+        for c in self.counts:
+            total += c
+            result.append(total)
+        return result
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile as the upper bound of the bucket it falls in."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in zip(BUCKETS, self.cumulative()):
+            if total >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        def ms(seconds: Optional[float]) -> Optional[float]:
+            return None if seconds is None else round(seconds * 1000, 3)
+
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.sum / self.count) if self.count else None,
+            "p50_ms": ms(self.quantile(0.5)),
+            "p99_ms": ms(self.quantile(0.99)),
+            "max_ms": ms(self.max) if self.count else None,
+        }
+
+
+class _CollectorStats:
+    __slots__ = ("latency", "errors", "last_success", "last_error", "last_error_at")
+
+    def __init__(self) -> None:
+        self.latency = Histogram()
+        self.errors = 0
+        self.last_success: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[float] = None
+
+
+class _RouteStats:
+    __slots__ = ("latency", "errors")
+
+    def __init__(self) -> None:
+        self.latency = Histogram()
+        self.errors = 0
+
+
+class AgentStats:
+    """Per-collector and per-route timing for the agent's own health."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._collectors: Dict[str, _CollectorStats] = {}
+        self._routes: Dict[str, _RouteStats] = {}
+        self.started = time.time()
+
+    def record_collector(self, name: str, seconds: float, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            entry = self._collectors.get(name)
+            if entry is None:
+                entry = self._collectors[name] = _CollectorStats()
+            entry.latency.observe(seconds)
+            if error is None:
+                entry.last_success = time.time()
+            else:
+                entry.errors += 1
+                entry.last_error = "%s: %s" % (type(error).__name__, error)
+                entry.last_error_at = time.time()
+
+    def record_request(self, route: str, seconds: float, status: int) -> None:
+        with self._lock:
+            entry = self._routes.get(route)
+            if entry is None:
+                entry = self._routes[route] = _RouteStats()
+            entry.latency.observe(seconds)
+            if status >= 500:
+                entry.errors += 1
+
+    def histograms(self) -> Dict[str, Dict[str, Any]]:
+        """Return raw histograms for exporters: {"collectors": {...}, "routes": {...}}."""
+        with self._lock:
+            return {
+                "collectors": {
+                    name: {
+                        "buckets": s.latency.cumulative(),
+                        "count": s.latency.count,
+                        "sum": s.latency.sum,
+                        "errors": s.errors,
+                        "last_success": s.last_success,
+                    }
+                    for name, s in self._collectors.items()
+                },
+                "routes": {
+                    route: {
+                        "buckets": s.latency.cumulative(),
+                        "count": s.latency.count,
+                        "sum": s.latency.sum,
+                        "errors": s.errors,
+                    }
+                    for route, s in self._routes.items()
+                },
+            }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-friendly summary with latency estimates in ms."""
+        with self._lock:
+            collectors = {}
+            for name, s in sorted(self._collectors.items()):
+                entry = s.latency.to_dict()
+                entry.update({
+                    "errors": s.errors,
+                    "last_success": s.last_success,
+                    "last_error": s.last_error,
+                    "last_error_at": s.last_error_at,
+                })
+                collectors[name] = entry
+            routes = {}
+            for route, r in sorted(self._routes.items()):
+                entry = r.latency.to_dict()
+                entry["errors"] = r.errors
+                routes[route] = entry
+        return {
+            "started_at": self.started,
+            "uptime_seconds": int(time.time() - self.started),
+            "collectors": collectors,
+            "routes": routes,
+        }
+
+
+stats = AgentStats()
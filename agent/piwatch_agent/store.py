@@ -0,0 +1,486 @@
+from __future__ import annotations
+
+import contextlib
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("piwatch")
+
+# Numeric series kept on disk. Deliberately a fixed list (no per-core or
+# per-interface columns) so a segment's row layout never changes.
+COLUMNS = (
+    "cpu_percent",
+    "load_1min",
+    "ram_percent",
+    "swap_percent",
+    "cpu_celsius",
+    "disk_root_percent",
+    "net_sent_bytes_per_sec",
+    "net_recv_bytes_per_sec",
+)
+
+# Every segment starts with a fixed-size header: magic, format version,
+# tier code, row size and column count, then the column names separated by
+# newlines, zero padded. Rows follow back to back.
+HEADER_SIZE = 512
+_MAGIC = b"PWTS"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHII")
+_TIMESTAMP = struct.Struct("<d")
+
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+
+
+class _Tier:
+    """One resolution level: raw samples or min/avg/max rollups."""
+
+    def __init__(self, name: str, code: int, bucket: int, segment_format: str) -> None:
+        self.name = name
+        self.code = code
+        # Seconds per rollup row, 0 for raw samples
+        self.bucket = bucket
+        # strftime pattern naming the segment a row belongs to (UTC)
+        self.segment_format = segment_format
+        if bucket:
+            # timestamp, samples in the bucket, then min/avg/max per column
+            self.row = struct.Struct("<dI" + "fff" * len(COLUMNS))
+        else:
+            self.row = struct.Struct("<d" + "f" * len(COLUMNS))
+
+    def segment_name(self, timestamp: float) -> str:
+        day = datetime.fromtimestamp(timestamp, timezone.utc)
+        return "%s-%s.seg" % (self.name, day.strftime(self.segment_format))
+
+    def segment_span(self, filename: str) -> Optional[Tuple[float, float]]:
+        """Return the [start, end) wall-clock range a segment file covers."""
+        prefix = self.name + "-"
+        if not filename.startswith(prefix) or not filename.endswith(".seg"):
+            return None
+        try:
+            start = datetime.strptime(filename[len(prefix):-4], self.segment_format)
+        except ValueError:
+            return None
+        start = start.replace(tzinfo=timezone.utc)
+        if self.segment_format == "%Y%m%d":
+            end = datetime.fromtimestamp(start.timestamp() + 86400, timezone.utc)
+        elif self.segment_format == "%Y%m":
+            end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+        else:
+            end = start.replace(year=start.year + 1)
+        return start.timestamp(), end.timestamp()
+
+    def header(self) -> bytes:
+        names = "\n".join(COLUMNS).encode("utf-8")
+        header = _HEADER.pack(_MAGIC, _VERSION, self.code, self.row.size, len(COLUMNS)) + names
+        return header.ljust(HEADER_SIZE, b"\0")
+
+
+# One segment file per UTC day of raw samples, per month of hourly rows and
+# per year of daily rows
+TIERS = (
+    _Tier("raw", 0, 0, "%Y%m%d"),
+    _Tier("hourly", 1, 3600, "%Y%m"),
+    _Tier("daily", 2, 86400, "%Y"),
+)
+_TIERS = {tier.name: tier for tier in TIERS}
+
+
+def _extract(snapshot: Dict[str, Any]) -> Tuple[float, ...]:
+    """Pull the stored columns out of a sampler snapshot (NaN when missing)."""
+    cpu = snapshot.get("cpu") or {}
+    memory = snapshot.get("memory") or {}
+    disks = snapshot.get("disk") or []
+    root = next((d for d in disks if d.get("mountpoint") == "/"), disks[0] if disks else None)
+    interfaces = ((snapshot.get("network") or {}).get("interfaces") or {}).values()
+
+    def rate(key: str) -> Optional[float]:
+        rates = [i.get(key) for i in interfaces if i.get(key) is not None]
+        return sum(rates) if rates else None
+
+    values = (
+        cpu.get("usage_percent"),
+        (cpu.get("load_avg") or {}).get("1min"),
+        (memory.get("ram") or {}).get("percent"),
+        (memory.get("swap") or {}).get("percent"),
+        (snapshot.get("temperature") or {}).get("cpu_celsius"),
+        root.get("percent") if root else None,
+        rate("bytes_sent_per_sec"),
+        rate("bytes_recv_per_sec"),
+    )
+    return tuple(math.nan if v is None else float(v) for v in values)
+
+
+def _clean(value: float) -> Optional[float]:
+    return None if math.isnan(value) else round(value, 2)
+
+
+class _SegmentView:
+    """A read-only memory map of the whole rows of one segment file."""
+
+    def __init__(self, path: str, tier: _Tier) -> None:
+        self.rows = 0
+        self._map: Optional[mmap.mmap] = None
+        self._tier = tier
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+            if len(header) < HEADER_SIZE:
+                return
+            magic, version, code, row_size, ncols = _HEADER.unpack_from(header)
+            if magic != _MAGIC or version != _VERSION or code != tier.code or row_size != tier.row.size:
+                logger.warning("Store: ignoring segment %s with an unexpected header", path)
+                return
+            size = os.fstat(f.fileno()).st_size
+            # A torn row at the end (crash mid-write) is simply not mapped
+            self.rows = (size - HEADER_SIZE) // row_size
+            if self.rows:
+                self._map = mmap.mmap(f.fileno(), HEADER_SIZE + self.rows * row_size, access=mmap.ACCESS_READ)
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _timestamp(self, index: int) -> float:
+        return _TIMESTAMP.unpack_from(self._map, HEADER_SIZE + index * self._tier.row.size)[0]
+
+    def _bisect(self, timestamp: float) -> int:
+        """Index of the first row at or after ``timestamp``."""
+        lo, hi = 0, self.rows
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._timestamp(mid) < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def slice(self, start: float, end: float) -> memoryview:
+        """Return the rows with start <= timestamp < end, without copying."""
+        if self._map is None:
+            return memoryview(b"")
+        first, last = self._bisect(start), self._bisect(end)
+        row_size = self._tier.row.size
+        return memoryview(self._map)[HEADER_SIZE + first * row_size:HEADER_SIZE + last * row_size]
+
+
+class Store:
+    """Append-only, memory-mapped time-series store on local disk.
+
+    One row of ``COLUMNS`` is recorded per sample. Rows are buffered in
+    memory and appended to the current segment every ``flush_seconds`` with
+    a single write and fdatasync, so an SD card sees one small sequential
+    write per flush and existing data is never rewritten. The same
+    background job rolls complete hours of raw rows up into hourly
+    min/avg/max rows, hours into days, and deletes whole segments older
+    than ``retention`` (days per tier). Queries map segments read-only and
+    binary search their timestamps, so a range is sliced straight out of
+    the page cache.
+
+    Timestamps must increase: samples at or before the newest stored one
+    (a Pi without an RTC booting with a stale clock) are dropped.
+    """
+
+    COLUMNS = COLUMNS
+
+    def __init__(self, directory: str, flush_seconds: float = 60.0, retention: Optional[Dict[str, float]] = None) -> None:
+        self.directory = directory
+        self._flush_seconds = flush_seconds
+        self._retention = retention or {"raw": 7, "hourly": 30, "daily": 365}
+        self._lock = threading.Lock()
+        # Serialises flush/rollup/retention between the background job and stop()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[str, List[bytes]] = {tier.name: [] for tier in TIERS}
+        self._last: Dict[str, Optional[float]] = {}
+        self._files: Dict[str, Tuple[str, int]] = {}
+        self._stop = threading.Event()
+
+    def open(self) -> bool:
+        """Create the directory and find where each tier left off."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for tier in TIERS:
+                self._last[tier.name] = self._newest_timestamp(tier)
+        except OSError as e:
+            logger.warning("Store disabled, %s unusable: %s", self.directory, e)
+            return False
+        return True
+
+    def start(self) -> None:
+        threading.Thread(target=self._loop, name="store", daemon=True).start()
+
+    def stop(self) -> None:
+        """Stop the background job and write out anything still buffered."""
+        self._stop.set()
+        self.flush()
+
+    def record(self, timestamp: float, snapshot: Dict[str, Any]) -> None:
+        """Buffer one raw row extracted from a sampler snapshot."""
+        with self._lock:
+            last = self._last.get("raw")
+            if last is not None and timestamp <= last:
+                return
+            self._last["raw"] = timestamp
+            self._pending["raw"].append(TIERS[0].row.pack(timestamp, *_extract(snapshot)))
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self._flush_seconds):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Store flush failed")
+
+    def flush(self) -> None:
+        """Append buffered rows, roll up complete buckets and apply retention."""
+        with self._flush_lock:
+            now = time.time()
+            self._write("raw")
+            for source, target in zip(TIERS, TIERS[1:]):
+                self._rollup(source, target, now)
+                self._write(target.name)
+            self._expire(now)
+
+    # Writing
+
+    def _segment_fd(self, tier: _Tier, name: str) -> int:
+        """Return an append descriptor for a segment, writing its header if new."""
+        current = self._files.get(tier.name)
+        if current is not None and current[0] == name:
+            return current[1]
+        if current is not None:
+            os.close(current[1])
+            del self._files[tier.name]
+
+        path = os.path.join(self.directory, name)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        size = os.fstat(fd).st_size
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if size >= HEADER_SIZE and header != tier.header():
+            # Written by another format version; keep it but start afresh
+            os.close(fd)
+            os.replace(path, path + ".old")
+            logger.warning("Store: segment %s has a different layout, moved to %s.old", path, path)
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            size = 0
+        if size < HEADER_SIZE:
+            os.ftruncate(fd, 0)
+            os.write(fd, tier.header())
+        elif (size - HEADER_SIZE) % tier.row.size:
+            # Drop a row torn by a crash so appends stay aligned
+            os.ftruncate(fd, size - (size - HEADER_SIZE) % tier.row.size)
+        self._files[tier.name] = (name, fd)
+        return fd
+
+    def _write(self, tier_name: str) -> None:
+        tier = _TIERS[tier_name]
+        with self._lock:
+            rows, self._pending[tier_name] = self._pending[tier_name], []
+        if not rows:
+            return
+        # Group consecutive rows by segment: usually all land in one file
+        groups: List[Tuple[str, List[bytes]]] = []
+        for row in rows:
+            name = tier.segment_name(_TIMESTAMP.unpack_from(row)[0])
+            if not groups or groups[-1][0] != name:
+                groups.append((name, []))
+            groups[-1][1].append(row)
+        try:
+            for name, group in groups:
+                fd = self._segment_fd(tier, name)
+                os.write(fd, b"".join(group))
+                _fdatasync(fd)
+        except OSError as e:
+            logger.warning("Store: writing %s rows failed, %d dropped: %s", tier_name, len(rows), e)
+
+    # Rollups and retention
+
+    def _rollup(self, source: _Tier, target: _Tier, now: float) -> None:
+        """Aggregate every complete bucket after the target's newest row."""
+        bucket = target.bucket
+        last = self._last.get(target.name)
+        start = last + bucket if last is not None else 0.0
+        end = math.floor(now / bucket) * bucket
+        if start >= end:
+            return
+
+        rows: List[bytes] = []
+        current: Optional[float] = None
+        group: List[Tuple[Any, ...]] = []
+        for values in self._iter_rows(source, start, end):
+            slot = math.floor(values[0] / bucket) * bucket
+            if slot != current and group:
+                rows.append(self._aggregate(source, target, current, group))
+                group = []
+            current = slot
+            group.append(values)
+        if group:
+            rows.append(self._aggregate(source, target, current, group))
+        if rows:
+            with self._lock:
+                self._pending[target.name].extend(rows)
+                self._last[target.name] = _TIMESTAMP.unpack_from(rows[-1])[0]
+
+    @staticmethod
+    def _aggregate(source: _Tier, target: _Tier, slot: Optional[float], group: List[Tuple[Any, ...]]) -> bytes:
+        ncols = len(COLUMNS)
+        fields: List[Any] = [slot, 0]
+        if source.bucket:
+            fields[1] = sum(row[1] for row in group)
+        else:
+            fields[1] = len(group)
+        for col in range(ncols):
+            if source.bucket:
+                mins = [row[2 + 3 * col] for row in group]
+                avgs = [(row[3 + 3 * col], row[1]) for row in group]
+                maxs = [row[4 + 3 * col] for row in group]
+            else:
+                mins = maxs = [row[1 + col] for row in group]
+                avgs = [(row[1 + col], 1) for row in group]
+            mins = [v for v in mins if not math.isnan(v)]
+            maxs = [v for v in maxs if not math.isnan(v)]
+            weighted = [(v, n) for v, n in avgs if not math.isnan(v)]
+            weight = sum(n for _, n in weighted)
+            fields.extend((
+                min(mins) if mins else math.nan,
+                sum(v * n for v, n in weighted) / weight if weight else math.nan,
+                max(maxs) if maxs else math.nan,
+            ))
+        return target.row.pack(*fields)
+
+    def _expire(self, now: float) -> None:
+        """Delete segments that end before their tier's retention window."""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for tier in TIERS:
+            cutoff = now - self._retention.get(tier.name, 0) * 86400
+            for name in names:
+                span = tier.segment_span(name)
+                if span is None or span[1] > cutoff:
+                    continue
+                current = self._files.get(tier.name)
+                if current is not None and current[0] == name:
+                    os.close(current[1])
+                    del self._files[tier.name]
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    logger.info("Store: removed expired segment %s", name)
+                except OSError as e:
+                    logger.warning("Store: can't remove %s: %s", name, e)
+
+    # Reading
+
+    def _segments(self, tier: _Tier, start: float, end: float) -> List[str]:
+        """Segment paths of a tier overlapping [start, end), oldest first."""
+        paths = []
+        for name in sorted(os.listdir(self.directory)):
+            span = tier.segment_span(name)
+            if span is not None and span[0] < end and span[1] > start:
+                paths.append(os.path.join(self.directory, name))
+        return paths
+
+    def _newest_timestamp(self, tier: _Tier) -> Optional[float]:
+        for path in reversed(self._segments(tier, float("-inf"), float("inf"))):
+            view = _SegmentView(path, tier)
+            try:
+                if view.rows:
+                    return view._timestamp(view.rows - 1)
+            finally:
+                view.close()
+        return None
+
+    @contextlib.contextmanager
+    def slices(self, tier_name: str, start: float, end: float) -> Iterator[List[memoryview]]:
+        """Yield the packed rows of a tier in [start, end) as buffers.
+
+        Stored rows are views into the segment maps, valid only inside the
+        ``with`` block; rows not yet flushed come last as one bytes chunk.
+        """
+        tier = _TIERS[tier_name]
+        views = [_SegmentView(path, tier) for path in self._segments(tier, start, end)]
+        chunks: List[memoryview] = []
+        try:
+            for view in views:
+                chunk = view.slice(start, end)
+                if chunk:
+                    chunks.append(chunk)
+                else:
+                    chunk.release()
+            with self._lock:
+                pending = [row for row in self._pending[tier_name] if start <= _TIMESTAMP.unpack_from(row)[0] < end]
+            if pending:
+                chunks.append(memoryview(b"".join(pending)))
+            yield chunks
+        finally:
+            for chunk in chunks:
+                chunk.release()
+            for view in views:
+                view.close()
+
+    def _iter_rows(self, tier: _Tier, start: float, end: float) -> Iterator[Tuple[Any, ...]]:
+        with self.slices(tier.name, start, end) as chunks:
+            for chunk in chunks:
+                yield from tier.row.iter_unpack(chunk)
+
+    def query(self, tier_name: str, start: float, end: float, columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Return the rows of a tier in [start, end) as columnar lists.
+
+        Raw series are lists of values; rollup series are
+        ``{"min": [...], "avg": [...], "max": [...]}`` with the number of
+        raw samples behind each row in ``samples``.
+        """
+        tier = _TIERS[tier_name]
+        wanted = [(i, name) for i, name in enumerate(COLUMNS) if columns is None or name in columns]
+        timestamps: List[float] = []
+        counts: List[int] = []
+        series: Dict[str, Any] = {
+            name: {"min": [], "avg": [], "max": []} if tier.bucket else [] for _, name in wanted
+        }
+        for row in self._iter_rows(tier, start, end):
+            timestamps.append(round(row[0], 3))
+            if tier.bucket:
+                counts.append(row[1])
+                for i, name in wanted:
+                    out = series[name]
+                    out["min"].append(_clean(row[2 + 3 * i]))
+                    out["avg"].append(_clean(row[3 + 3 * i]))
+                    out["max"].append(_clean(row[4 + 3 * i]))
+            else:
+                for i, name in wanted:
+                    series[name].append(_clean(row[1 + i]))
+
+        data: Dict[str, Any] = {
+            "tier": tier.name,
+            "start": start,
+            "end": end,
+            "count": len(timestamps),
+            "timestamps": timestamps,
+        }
+        if tier.bucket:
+            data["interval_seconds"] = tier.bucket
+            data["samples"] = counts
+        data["series"] = series
+        return data
+
+    @staticmethod
+    def row_format(tier_name: str) -> str:
+        """The struct format of one packed row of a tier."""
+        return _TIERS[tier_name].row.format
+
+    def pick_tier(self, start: float, end: float, now: float) -> str:
+        """Choose the finest tier that still holds ``start`` and keeps ranges small."""
+        span = end - start
+        if span <= 2 * 86400 and start >= now - self._retention.get("raw", 0) * 86400:
+            return "raw"
+        if span <= 60 * 86400 and start >= now - self._retention.get("hourly", 0) * 86400:
+            return "hourly"
+        return "daily"
+
@@ -0,0 +1,169 @@
+"""Tests for the Docker collector against a fake Engine API on a Unix socket."""
+
+from __future__ import annotations
+
+import json
+import os
+import queue
+import shutil
+import socketserver
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler
+from unittest import mock
+
+from piwatch_agent import config
+from piwatch_agent.collectors import docker
+
+CONTAINERS = [
+    {
+        "Id": "0123456789abcdef0123",
+        "Names": ["/web"],
+        "Image": "nginx:alpine",
+        "Status": "Up 2 hours",
+        "State": "running",
+        "Ports": [{"IP": "0.0.0.0", "PrivatePort": 80, "PublicPort": 8080, "Type": "tcp"}],
+    },
+]
+
+
+class _FakeEngine(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves canned /containers/json and a /events stream fed from a queue."""
+
+    daemon_threads = True
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path, _EngineHandler)
+        self.list_requests = 0
+        self.events: "queue.Queue[object]" = queue.Queue()
+        self.watching = threading.Event()
+
+
+class _EngineHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: _FakeEngine
+
+    def do_GET(self) -> None:
+        if self.path == "/containers/json?all=1":
+            self.server.list_requests += 1
+            body = json.dumps(CONTAINERS).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path.startswith("/events?"):
+            # No length: the stream runs until the connection closes
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.flush()
+            self.server.watching.set()
+            while True:
+                event = self.server.events.get()
+                if event is None:
+                    break
+                self.wfile.write(json.dumps(event).encode() + b"\n")
+                self.wfile.flush()
+            self.close_connection = True
+        else:
+            self.send_error(404)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+def _wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class DockerClientTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmp, "docker.sock")
+        self.engine = _FakeEngine(self.socket_path)
+        threading.Thread(target=self.engine.serve_forever, daemon=True).start()
+
+    def tearDown(self) -> None:
+        self.engine.events.put(None)
+        self.engine.shutdown()
+        self.engine.server_close()
+        shutil.rmtree(self.tmp)
+
+    def test_containers_are_formatted_like_docker_ps(self) -> None:
+        client = docker.DockerClient(self.socket_path)
+        self.assertEqual(client.containers(), [{
+            "id": "0123456789ab",
+            "name": "web",
+            "image": "nginx:alpine",
+            "status": "Up 2 hours",
+            "ports": "0.0.0.0:8080->80/tcp",
+            "state": "running",
+        }])
+
+    def test_list_is_refetched_without_events_watcher(self) -> None:
+        client = docker.DockerClient(self.socket_path)
+        client.containers(max_age=60)
+        client.containers(max_age=60)
+        self.assertEqual(self.engine.list_requests, 2)
+
+    def test_event_invalidates_cached_list(self) -> None:
+        client = docker.DockerClient(self.socket_path)
+        client.watch_events()
+        self.assertTrue(self.engine.watching.wait(5))
+        # Connecting marks the cache dirty so anything missed is refetched
+        self.assertTrue(_wait_for(client._dirty.is_set))
+
+        client.containers(max_age=60)
+        client.containers(max_age=60)
+        self.assertEqual(self.engine.list_requests, 1)
+
+        self.engine.events.put({"Type": "container", "Action": "start", "id": "0123456789ab"})
+        self.assertTrue(_wait_for(client._dirty.is_set))
+        client.containers(max_age=60)
+        self.assertEqual(self.engine.list_requests, 2)
+
+    def test_collect_uses_api_when_socket_exists(self) -> None:
+        with mock.patch.object(docker, "_client", docker.DockerClient(self.socket_path)), \
+                mock.patch.object(config, "DOCKER_EVENTS", False), \
+                mock.patch.object(config, "DOCKER_STATS", False), \
+                mock.patch.object(docker.subprocess, "run") as run:
+            data = docker.collect()
+        run.assert_not_called()
+        self.assertEqual(data["container_count"], 1)
+        self.assertEqual(data["containers"][0]["name"], "web")
+
+
+class DockerCliFallbackTest(unittest.TestCase):
+    def setUp(self) -> None:
+        missing = os.path.join(tempfile.gettempdir(), "piwatch-test-missing.sock")
+        patcher = mock.patch.object(docker, "_client", docker.DockerClient(missing))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_collect_falls_back_to_cli(self) -> None:
+        line = json.dumps({"id": "0123456789ab", "name": "web", "image": "nginx:alpine",
+                           "status": "Up 2 hours", "ports": "", "state": "running"})
+        result = subprocess.CompletedProcess([], 0, stdout=line + "\n", stderr="")
+        with mock.patch.object(docker.subprocess, "run", return_value=result) as run:
+            data = docker.collect()
+        self.assertEqual(run.call_args[0][0][:2], ["docker", "ps"])
+        self.assertEqual(data["container_count"], 1)
+        self.assertEqual(data["containers"][0]["name"], "web")
+
+    def test_collect_returns_none_without_cli(self) -> None:
+        with mock.patch.object(docker.subprocess, "run", side_effect=FileNotFoundError):
+            self.assertIsNone(docker.collect())
+
+
+if __name__ == "__main__":
+    unittest.main()